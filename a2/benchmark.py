@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Times the data cleaning and calculation helpers in route_manager.py against the row-by-row versions they replaced
+Sample input: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml"
+
+Adding --SCALES="1,10,100" instead times every stage of route_manager.py on synthetic copies of the input that are
+1, 10 and 100 times its size, and writes the timings to --REPORT (benchmark.json by default). The synthetic yaml files
+are written to --WORKDIR, or to a temporary directory that is removed afterwards
+
+--STARTUP=5 instead starts python 5 times with -X importtime, once importing route_manager.py as it is and once also
+importing the modules it defers the way it used to import them, and prints the fastest import and wall time of each
+The arguments are read the same way as by route_manager.py, and --help lists them all
+@author: doyeniyi
+"""
+import os
+import sys
+import json
+import argparse
+import time
+import shutil
+import subprocess
+import platform
+import tempfile
+import datetime
+import yaml
+import pandas as pd
+import route_manager
+
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+TABLES: tuple = ('airlines', 'airports', 'routes')
+ID_OFFSET: int = 1000000                            # each synthetic copy's ids are shifted by this much, more than any real id
+RENAMED_COLUMNS: tuple = ('airline_name', 'airport_name', 'airport_city')   # suffixed in each copy so the groups grow too
+STARTUP_IMPORTS: dict = {                           # what each startup measurement imports
+    'lazy': 'import route_manager',
+    'eager': 'import yaml, numpy, pandas, matplotlib.figure, route_manager',
+}
+
+
+def legacy_df_lstrip(df: pd.DataFrame, columns: str) -> pd.DataFrame:
+    '''
+    the original cell-by-cell version of route_manager.df_lstrip, kept here only to be timed against
+
+    param df: the data frame that this function wants to modify
+    param columns: a list of the column names in df
+    return: the updated data frame
+    '''
+    for index, row in df.iterrows():
+        for column in columns:
+            if type(df.loc[index,column]) == str:
+                df.loc[index,column] = df.loc[index,column].lstrip()
+    return df
+
+
+def legacy_column_diff(df: pd.DataFrame, in1: str, in2: str, out: str) -> pd.DataFrame:
+    '''
+    the original cell-by-cell version of route_manager.column_diff, kept here only to be timed against
+
+    param df: the data frame that this function wants to modify
+    param in1: string that spicifies the first column included in the calculation
+    param in2: string that specifies the second column included in the calculation
+    param out: string that specifies what column the resulting values should be stored in
+    return: the updated data frame
+    '''
+    df[out] = -1.0
+    for index, row in df.iterrows():
+        df.loc[index,out] = abs(float(row[in1]) - float(row[in2]))
+    return df
+
+
+def time_call(function, *args) -> tuple:
+    '''
+    runs the function once and measures how long it took
+
+    param function: the function to be timed
+    param args: the arguments passed to the function
+    return: a tuple of the function's result and the elapsed wall time in seconds
+    '''
+    start: float = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_lstrip(name: str, df: pd.DataFrame) -> None:
+    '''
+    times legacy_df_lstrip against route_manager.df_lstrip on a copy of the same data frame,
+    checks that both give the same data frame and prints the speedup
+
+    param name: the name of the table, used when printing
+    param df: the data frame to strip
+    return: the results are printed thus returns nothing
+    '''
+    old, old_time = time_call(legacy_df_lstrip, df.copy(), df.columns)
+    new, new_time = time_call(route_manager.df_lstrip, df.copy())
+    same: bool = old.equals(new)
+    print(f"df_lstrip {name:<9} rows={len(df):<6} loop={old_time:9.4f}s vectorized={new_time:9.4f}s "
+          f"speedup={old_time / new_time:8.1f}x identical={same}")
+
+
+def bench_column_diff(airports_df: pd.DataFrame, routes_df: pd.DataFrame) -> None:
+    '''
+    joins every route to the altitudes of both of its airports, then times legacy_column_diff against
+    route_manager.column_diff on that frame and prints the speedup
+
+    param airports_df: dataframe containing information on airports
+    param routes_df: dataframe containing formation on routes
+    return: the results are printed thus returns nothing
+    '''
+    altitudes: pd.DataFrame = airports_df[['airport_id', 'airport_altitude']]
+    df: pd.DataFrame = routes_df.merge(altitudes.rename(columns={'airport_id':'route_to_airport_id', 'airport_altitude':'to_altitude'}), on='route_to_airport_id')
+    df = df.merge(altitudes.rename(columns={'airport_id':'route_from_aiport_id', 'airport_altitude':'from_altitude'}), on='route_from_aiport_id')
+
+    old, old_time = time_call(legacy_column_diff, df.copy(), 'to_altitude', 'from_altitude', 'diff')
+    typed: pd.DataFrame = df.astype({'to_altitude': float, 'from_altitude': float})
+    new, new_time = time_call(route_manager.column_diff, typed, 'to_altitude', 'from_altitude', 'diff')
+    same: bool = old['diff'].equals(new['diff'])
+    print(f"column_diff rows={len(df):<6} loop={old_time:9.4f}s vectorized={new_time:9.4f}s "
+          f"speedup={old_time / new_time:8.1f}x identical={same}")
+
+
+def scale_tables(frames: dict, scale: int) -> dict:
+    '''
+    makes a synthetic data set out of scale copies of the input tables. every copy has its own ids and its routes
+    only use its own airlines and airports, and the copies after the first have their own airline, airport and city
+    names, so the number of groups in each question grows along with the number of rows
+
+    param frames: the airlines, airports and routes data frames as parsed from the yaml files, all strings
+    param scale: the number of copies
+    return: a dictionary of the scaled airlines, airports and routes data frames
+    '''
+    scaled: dict = {}
+    for name, df in frames.items():
+        copies: list = []
+        for copy in range(scale):
+            df_copy: pd.DataFrame = df.copy()
+            for column in df.columns:
+                if column.endswith('_id'):                  # unknown ids such as \N are left as they are
+                    ids: pd.Series = pd.to_numeric(df[column], errors='coerce').astype('Int64') + copy * ID_OFFSET
+                    df_copy[column] = ids.astype(str).where(ids.notna(), df[column])
+                elif column in RENAMED_COLUMNS and copy > 0:
+                    df_copy[column] = df[column] + f" {copy}"
+            copies.append(df_copy)
+        scaled[name] = pd.concat(copies, ignore_index=True)
+    return scaled
+
+
+def write_tables(frames: dict, directory: str) -> dict:
+    '''
+    writes each table to its own yaml file in the same layout as the input files
+
+    param frames: the airlines, airports and routes data frames
+    param directory: string that specifies the directory the yaml files are written to
+    return: a dictionary of the path of each table's yaml file
+    '''
+    paths: dict = {}
+    for name, df in frames.items():
+        paths[name] = os.path.join(directory, f"{name}.yaml")
+        with open(paths[name], 'w') as f:
+            yaml.dump({name: df.to_dict('records')}, f, Dumper=YamlDumper, sort_keys=False, allow_unicode=True)
+    return paths
+
+
+def parse_table(path: str, table: str) -> pd.DataFrame:
+    '''
+    parses a table with the event parser route_manager.parse_table uses, without cleaning it
+
+    param path: string that specifies the yaml file to parse
+    param table: string that specifies the top level key of the yaml file holding the table
+    return: the table as a data frame of strings, exactly as parsed
+    '''
+    return next(route_manager.iter_table_chunks(path, table, None, clean=False), pd.DataFrame())
+
+
+def bench_stages(paths: dict, directory: str) -> dict:
+    '''
+    runs every stage of route_manager.py once on the given yaml files and times each stage. the csv and pdf files
+    are written to the given directory
+
+    param paths: a dictionary of the path of each table's yaml file
+    param directory: string that specifies the directory the output files are written to
+    return: a dictionary of the row counts, the seconds taken by each stage and the seconds taken by each question
+    '''
+    seconds: dict = {'parse': 0.0, 'normalise': 0.0, 'cached_load': 0.0}
+    frames: dict = {}
+    for name, path in paths.items():
+        raw, elapsed = time_call(parse_table, path, name)
+        seconds['parse'] += elapsed
+        frames[name], elapsed = time_call(route_manager.clean_frame, raw)
+        seconds['normalise'] += elapsed
+        route_manager.load_table(path, name)                    # the first call only writes the cache
+        frames[name], elapsed = time_call(route_manager.load_table, path, name)
+        seconds['cached_load'] += elapsed
+
+    db, seconds['join'] = time_call(route_manager.RouteDatabase, frames['airlines'], frames['airports'], frames['routes'])
+
+    answers: dict = {}
+    questions: dict = {}
+    for question, query in route_manager.QUERIES.items():
+        if query.join == 'distance' and not set(route_manager.COORDINATE_COLUMNS) <= set(frames['airports'].columns):
+            continue                                            # the distance questions need airports with coordinates
+        answers[question], questions[question] = time_call(route_manager.run_query, db, query)
+    seconds['aggregate'] = sum(questions.values())
+
+    # the writer route_manager.py's main uses. the csv files are all written before any chart is drawn, where main
+    # overlaps the two, so that each is timed on its own
+    with route_manager.OutputWriter(len(answers) * len(route_manager.GRAPH_TYPES)) as output:
+        charts: list = []
+        start: float = time.perf_counter()
+        for question, answer in answers.items():
+            query: route_manager.Query = route_manager.QUERIES[question]
+            text, keys, values = route_manager.answer_csv(answer, query)
+            output.write(os.path.join(directory, f"{question}.csv"), text)
+            charts.append((question, keys, values, query))
+        output.wait()
+        seconds['csv_write'] = time.perf_counter() - start      # building the csv text and writing every file
+
+        start = time.perf_counter()
+        for question, keys, values, query in charts:
+            for graph_type in route_manager.GRAPH_TYPES:
+                output.render(keys, values, query, graph_type, os.path.join(directory, f"{question}_{graph_type}.pdf"))
+        output.wait()
+        seconds['chart_render'] = time.perf_counter() - start   # drawing and saving every chart on the writer's process pool
+
+    return {'rows': {name: len(df) for name, df in frames.items()}, 'seconds': seconds, 'question_seconds': questions}
+
+
+def run_suite(frames: dict, scales: list, workdir: str, report: str) -> None:
+    '''
+    times every stage at each scale, printing the timings as it goes, and writes them all to the report as json
+
+    param frames: the airlines, airports and routes data frames as parsed from the yaml files, all strings
+    param scales: the sizes of the synthetic data sets as multiples of the input
+    param workdir: string that specifies the directory where the synthetic data sets are written
+    param report: string that specifies the json file the timings are written to
+    return: the results are printed and written to the report thus returns nothing
+    '''
+    results: list = []
+    for scale in scales:
+        directory: str = os.path.join(workdir, f"x{scale}")
+        os.makedirs(directory, exist_ok=True)
+        result: dict = {'scale': scale, **bench_stages(write_tables(scale_tables(frames, scale), directory), directory)}
+        results.append(result)
+        print(f"x{scale:<4} routes={result['rows']['routes']:<9} " +
+              " ".join(f"{stage}={elapsed:.3f}s" for stage, elapsed in result['seconds'].items()))
+
+    with open(report, 'w') as f:
+        json.dump({'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'python': platform.python_version(),
+                   'pandas': pd.__version__,
+                   'yaml_loader': route_manager.yaml_loader().__name__,
+                   'results': results}, f, indent=2)
+
+
+def import_seconds(statement: str) -> tuple:
+    '''
+    runs the statement in a fresh python process with -X importtime, from the directory of route_manager.py
+
+    param statement: the python statement to run, which imports the modules being measured
+    return: a tuple of the seconds spent importing as reported by -X importtime, and the wall time of the whole process
+    '''
+    start: float = time.perf_counter()
+    result: subprocess.CompletedProcess = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], capture_output=True,
+                                                         text=True, check=True, cwd=os.path.dirname(os.path.abspath(route_manager.__file__)))
+    wall: float = time.perf_counter() - start
+
+    microseconds: int = 0
+    for line in result.stderr.splitlines():     # "import time: self | cumulative | name", nested imports have an indented name
+        fields: list = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit() and not fields[2].startswith('  '):
+            microseconds += int(fields[1])
+    return microseconds / 1e6, wall
+
+
+def bench_startup(runs: int) -> None:
+    '''
+    times the startup of route_manager.py with its deferred imports against importing everything up front, and prints
+    the fastest of the runs of each, the first of which is usually the coldest
+
+    param runs: the number of times each is started
+    return: the results are printed thus returns nothing
+    '''
+    for name, statement in STARTUP_IMPORTS.items():
+        timings: list = [import_seconds(statement) for run in range(runs)]
+        print(f"startup {name:<5} import={min(t[0] for t in timings) * 1000:8.1f}ms wall={min(t[1] for t in timings) * 1000:8.1f}ms "
+              f"first_wall={timings[0][1] * 1000:8.1f}ms")
+
+
+def parse_scales(argument: str) -> list:
+    '''
+    param argument: the --SCALES argument, a comma separated list of whole numbers such as "1,10,100"
+    return: the list of scales
+    '''
+    scales: list = [scale.strip() for scale in argument.split(',')]
+    if not all(scale.isdigit() and int(scale) > 0 for scale in scales):
+        raise argparse.ArgumentTypeError(f"{argument} is not a comma separated list of whole numbers of at least 1")
+    return [int(scale) for scale in scales]
+
+
+def parse_arguments(argv: list) -> argparse.Namespace:
+    '''
+    reads the command line arguments, which can be given in any order, and checks them before anything is read
+
+    param argv: the command line arguments, without the program name
+    return: the arguments, named after their flags in lower case
+    '''
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="times route_manager.py and the helpers it replaced")
+    route_manager.add_table_arguments(parser)
+    parser.add_argument('--SCALES', dest='scales', type=parse_scales, help="times every stage on synthetic copies this many times the input's size, such as 1,10,100")
+    parser.add_argument('--WORKDIR', dest='workdir', help="the directory the synthetic copies are written to, a temporary one by default")
+    parser.add_argument('--REPORT', dest='report', default='benchmark.json', help="the json file the timings of --SCALES are written to")
+    parser.add_argument('--STARTUP', dest='startup', type=route_manager.whole_number, help="times the startup of route_manager.py this many times instead")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    if args.startup is None:
+        route_manager.check_table_arguments(parser, args)
+        if args.data is not None:
+            parser.error("--DATA is not benchmarked, give --AIRLINES, --AIRPORTS and --ROUTES instead")
+    elif args.startup == 0:
+        parser.error("--STARTUP must be at least 1")
+    return args
+
+
+def main():
+    args: argparse.Namespace = parse_arguments(sys.argv[1:])                    # exits here on a bad argument, before anything is read
+    if args.startup is not None:
+        bench_startup(args.startup)
+        return
+
+    frames: dict = {}
+    for name, path in zip(TABLES, (args.airlines, args.airports, args.routes)):
+        frames[name] = parse_table(path, name)
+
+    if args.scales is not None:
+        workdir: str = args.workdir or tempfile.mkdtemp(prefix='route_manager_benchmark_')
+        try:
+            run_suite(frames, args.scales, workdir, args.report)
+        finally:
+            if args.workdir is None:
+                shutil.rmtree(workdir)
+        return
+
+    for name, df in frames.items():
+        bench_lstrip(name, df)
+    bench_column_diff(frames['airports'], frames['routes'])
+
+
+if __name__ == '__main__':
+    main()
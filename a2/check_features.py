@@ -0,0 +1,631 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Checks the features of route_manager.py and route_server.py that the q1 to q5 tests of tester do not reach
+Sample input: ./check_features.py to run every check, or ./check_features.py graph to run only some of them
+
+graph       runs route_manager.py for q6 and compares its csv file with tests/q6.csv, and compares the hops and
+            connections of RouteGraph with a breadth first search over the routes in plain python
+distances   runs route_manager.py for q7 to q10 and compares its csv files with tests/q7.csv to tests/q10.csv, and
+            checks that q7 stops with an error when the airports have no coordinates
+server      starts route_server.py on a free port and compares its answers with the files in tests, the route graph and
+            the airport index, and checks that bad requests are answered with an error
+state       answers q1 to q6 by streaming the routes, and from saved route counts updated with added and removed
+            routes, and compares them with the same files as a full load. also removes more routes than were added
+profile     runs route_manager.py with --PROFILE on copies of the yaml files, once parsing them and once from their caches
+            with --PROFILE_MEMORY as well, and checks the stages, timings and row counts written to the json file
+joins       checks that JoinCache drops the least recently used join when it is full and counts its hits and misses, and that
+            questions sharing a join build it once
+combined    writes the bundled routes as one combined document, and compares what --DATA answers from it with what the
+            three files answer for the same routes, as well as the ids and airports split_combined gives them
+projection  loads a copy of airports.yaml a few columns at a time, and checks that only those columns are kept, that the
+            cache next to it is widened to every column asked for so far, and that it is only reused while it has them
+columns     converts the yaml files with convert.py and answers q1 to q10 from the columnar directories it writes
+index       compares AirportIndex with measuring the distance to every airport, near the poles and the antimeridian too
+
+q7 to q10 and the server are answered from tests/airports-coordinates.yaml, a few large airports of airports.yaml with their coordinates
+@author: doyeniyi
+"""
+import os
+import sys
+import shutil
+import pickle
+import json
+import random
+import tempfile
+import threading
+import subprocess
+import collections
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+import yaml
+import route_manager
+import route_server
+
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+PROGRAM_NAME: str = 'check_features'
+TEST_FILES_FOLDER: str = 'tests'
+COORDINATES_FILE: str = os.path.join(TEST_FILES_FOLDER, 'airports-coordinates.yaml')     # the only airports file with coordinates
+DISTANCE_QUESTIONS: tuple = ('q7', 'q8', 'q9', 'q10')                                      # the questions answered from coordinates
+TABLE_FILES: dict = {'airlines': 'airlines.yaml', 'airports': 'airports.yaml', 'routes': 'routes.yaml'}
+STATE_QUESTIONS: tuple = ('q1', 'q2', 'q3', 'q4', 'q5', 'q6')                                    # the questions answered from route counts
+PROFILE_QUESTIONS: tuple = ('q1', 'q3')                                                          # the questions of the profiled runs
+STAGE_FIELDS: tuple = ('stage', 'wall_seconds', 'cpu_seconds', 'max_rss_kilobytes')                # what every profiled stage records
+PROJECTIONS: list = [                       # the airports columns each load asks for, None for every column, and whether the cache has them
+    (('airport_id', 'airport_country'), 'miss'), (('airport_id', 'airport_city'), 'miss'), (('airport_country',), 'hit'),
+    (('airport_id', 'airport_city', 'airport_country'), 'hit'), (None, 'miss'), (('airport_altitude',), 'hit'),
+]
+COLUMNS_SUFFIX: str = '.columns'                                                                 # the suffix of each directory convert.py writes
+CHANGED_ROUTES: int = 500                   # routes left out of the saved counts and added back, and routes added twice and removed again
+SEARCH_SOURCES: int = 25                    # airports the graph is searched from
+SEARCH_POINTS: int = 200                    # random points the airport index is searched around
+EDGE_POINTS: list = [(90.0, 0.0), (-90.0, 0.0), (89.9, 179.9), (-89.9, -179.9), (0.0, 180.0), (0.0, -180.0),
+                     (51.47, 179.99), (-33.9, -179.99), (65.0, 179.5), (-16.0, -179.5)]     # poles and both sides of the antimeridian
+SEARCH_RADII: list = [0.0, 50.0, 500.0, 3000.0, 15000.0, 25000.0, float('inf')]
+
+
+def print_message(is_error: bool, message: str) -> None:
+    '''
+    prints a message to stdout the way validator does
+
+    param is_error: whether the message is an error
+    param message: the message to be printed out
+    return: the message is printed thus returns nothing
+    '''
+    message_type: str = 'ERROR' if is_error else 'INFO'
+    print(f'[{PROGRAM_NAME}] ({message_type}): {message}')
+
+
+def expected_csv(question: str) -> str:
+    '''
+    param question: string that specifies the question, like q6
+    return: the text of the expected csv file of the question
+    '''
+    with open(os.path.join(TEST_FILES_FOLDER, f"{question}.csv")) as f:
+        return f.read()
+
+
+def run_questions(directory: str, questions: tuple, *arguments: str) -> dict:
+    '''
+    runs route_manager.py once for several questions, in a directory of its own so its files do not replace any others
+
+    param directory: the directory the csv and pdf files are written to
+    param questions: the questions to answer
+    param arguments: further command line arguments, such as the files to read
+    return: a dictionary of the text of each question's csv file, a CalledProcessError is raised when the run fails
+    '''
+    program: str = os.path.abspath('route_manager.py')
+    subprocess.run([sys.executable, program, f"--QUESTION={','.join(questions)}", '--GRAPH_TYPE=bar', *arguments],
+                   cwd=directory, check=True, capture_output=True, text=True)
+    answers: dict = {}
+    for question in questions:
+        with open(os.path.join(directory, f"{question}.csv")) as f:
+            answers[question] = f.read()
+    return answers
+
+
+def compare_answers(answers: dict, name: str) -> bool:
+    '''
+    param answers: a dictionary of the text of each question's csv file
+    param name: what the answers were produced by, for the messages
+    return: whether every answer is the same as its file in tests
+    '''
+    passed: bool = True
+    for question, text in answers.items():
+        if text != expected_csv(question):
+            print_message(True, f"{question} {name} differs from {TEST_FILES_FOLDER}/{question}.csv")
+            passed = False
+    return passed
+
+
+def absolute_tables(airports: str = TABLE_FILES['airports']) -> list:
+    '''
+    param airports: string that specifies the airports yaml file
+    return: the command line arguments naming the three files, as absolute paths
+    '''
+    return [f"--AIRLINES={os.path.abspath(TABLE_FILES['airlines'])}", f"--AIRPORTS={os.path.abspath(airports)}",
+            f"--ROUTES={os.path.abspath(TABLE_FILES['routes'])}"]
+
+
+def columnar_tables(directory: str) -> list:
+    '''
+    param directory: the directory convert.py wrote the three tables to
+    return: the command line arguments naming the three columnar directories
+    '''
+    return [f"--{table.upper()}={os.path.join(directory, table + COLUMNS_SUFFIX)}" for table in TABLE_FILES]
+
+
+def raw_table(path: str, table: str) -> pd.DataFrame:
+    '''
+    param path: string that specifies the yaml file
+    param table: string that specifies the top level key of the yaml file holding the table
+    return: the table as a data frame of the strings in the file
+    '''
+    return next(route_manager.iter_table_chunks(path, table, None, clean=False))
+
+
+def profiled_stages(parsed: bool) -> list:
+    '''
+    param parsed: whether the yaml files are parsed, or loaded from their caches
+    return: the names of the stages a profiled run of PROFILE_QUESTIONS records, in the order they end
+    '''
+    loads: list = [stage for table in TABLE_FILES for stage in ((f"parse {table}", f"clean {table}") if parsed else ()) + (f"load {table}",)]
+    answers: list = [stage for question in PROFILE_QUESTIONS for stage in (f"answer {question}", f"csv {question}")]
+    return ['import', *loads, 'join', *answers, 'output']
+
+
+def check_profile() -> bool:
+    '''
+    return: whether --PROFILE writes every stage with its timings and row counts, the peak memory of each only with
+            --PROFILE_MEMORY, and whether --PROFILE_MEMORY without --PROFILE stops with a usage error
+    '''
+    passed: bool = True
+    with tempfile.TemporaryDirectory() as directory:
+        for path in TABLE_FILES.values():           # copies have no cache yet, so the first run parses them
+            shutil.copyfile(path, os.path.join(directory, path))
+        tables: list = [f"--{table.upper()}={os.path.join(directory, path)}" for table, path in TABLE_FILES.items()]
+        for parsed, memory in ((True, []), (False, ['--PROFILE_MEMORY'])):
+            report: str = os.path.join(directory, 'profile.json')
+            run_questions(directory, PROFILE_QUESTIONS, *tables, f"--PROFILE={report}", *memory)
+            with open(report) as f:
+                profile: dict = json.load(f)
+            stages: list = profile['stages']
+            fields: tuple = STAGE_FIELDS + (('peak_memory_bytes',) if memory else ())
+            if (set(profile) != {'stages', 'max_rss_kilobytes'} or [stage['stage'] for stage in stages] != profiled_stages(parsed)
+                    or not all(set(fields) <= set(stage) and ('peak_memory_bytes' in stage) == bool(memory) for stage in stages)
+                    or not all(stage[field] >= 0 for stage in stages for field in fields[1:])):
+                print_message(True, f"--PROFILE {' '.join(memory)} wrote {[stage['stage'] for stage in stages]} instead of {profiled_stages(parsed)} "
+                                    f"each with {', '.join(fields)}")
+                passed = False
+                continue
+            named: dict = {stage['stage']: stage for stage in stages}
+            if (named['load routes']['cache'] != ('miss' if parsed else 'hit') or named['answer q1']['rows_out'] != route_manager.QUERIES['q1'].limit
+                    or named['join']['routes_in'] != named['load routes']['rows_out']):
+                print_message(True, f"--PROFILE {' '.join(memory)} recorded the wrong cache use or row counts")
+                passed = False
+
+        error: subprocess.CompletedProcess = subprocess.run([sys.executable, os.path.abspath('route_manager.py'), '--QUESTION=q1', '--GRAPH_TYPE=bar',
+                                                             *tables, '--PROFILE_MEMORY'], cwd=directory, capture_output=True, text=True)
+        if error.returncode != 2 or '--PROFILE_MEMORY needs --PROFILE' not in error.stderr:
+            print_message(True, "--PROFILE_MEMORY without --PROFILE did not stop with a usage error")
+            passed = False
+    return passed
+
+
+def check_joins() -> bool:
+    '''
+    return: whether JoinCache keeps the most recently used joins and counts its hits and misses, and whether questions
+            on a database reuse the joins they share until the joins are cleared
+    '''
+    built: list = []
+    cache: route_manager.JoinCache = route_manager.JoinCache(2)
+    for key in ('a', 'b', 'a', 'c', 'a', 'b'):      # c drops b, the least recently used, so b is built again and drops c
+        cache.get(key, lambda: built.append(key) or key.upper())
+    passed: bool = built == ['a', 'b', 'c', 'b'] and (cache.hits, cache.misses) == (2, 4) and list(cache.results) == ['a', 'b']
+    if not passed:
+        print_message(True, f"JoinCache of size 2 built {built} with {cache.hits} hits and {cache.misses} misses, keeping {list(cache.results)}")
+    cache.clear()
+    if cache.get('a', lambda: 'A') != 'A' or cache.misses != 5:
+        print_message(True, "JoinCache did not build a join again after it was cleared")
+        passed = False
+
+    db: route_manager.RouteDatabase = route_manager.RouteDatabase.load(*TABLE_FILES.values())
+    first: pd.DataFrame = route_manager.run_query(db, route_manager.QUERIES['q3'])
+    misses: int = db.joins.misses
+    again: pd.DataFrame = route_manager.run_query(db, route_manager.QUERIES['q3'])
+    route_manager.run_query(db, route_manager.QUERIES['q4'])      # groups the same join of the destination airports differently
+    if db.joins.misses != misses + 1 or db.joins.hits < 2 or not first.equals(again):
+        print_message(True, f"q3 asked again and q4 rebuilt joins q3 had built, with {db.joins.hits} hits and {db.joins.misses} misses")
+        passed = False
+    db.joins.clear()                                # as RouteDatabase.update does after changing the counts
+    route_manager.run_query(db, route_manager.QUERIES['q3'])
+    if db.joins.misses != misses * 2 + 1:
+        print_message(True, "q3 did not build its joins again once they were cleared")
+        passed = False
+    return passed
+
+
+def write_combined(directory: str, airports: str) -> tuple:
+    '''
+    writes the routes whose airline and airports are all known as one combined document, in which each route names its
+    airline and airports, and as a routes file of the same routes in the same order
+
+    param directory: the directory both files are written to
+    param airports: string that specifies the airports yaml file the routes' airports are named from
+    return: a tuple of the paths of the combined document and of the routes file
+    '''
+    airlines: pd.DataFrame = raw_table(TABLE_FILES['airlines'], 'airlines')
+    airport_df: pd.DataFrame = raw_table(airports, 'airports')
+    routes: pd.DataFrame = raw_table(TABLE_FILES['routes'], 'routes')
+    ends: list = [airport_df.add_prefix(f"{end}_") for end in ('from', 'to')]
+    combined: pd.DataFrame = (routes.merge(airlines, left_on='route_airline_id', right_on='airline_id')
+                                    .merge(ends[0], left_on='route_from_aiport_id', right_on='from_airport_id')
+                                    .merge(ends[1], left_on='route_to_airport_id', right_on='to_airport_id'))
+    paths: tuple = (os.path.join(directory, 'combined.yaml'), os.path.join(directory, 'routes.yaml'))
+    write_routes(paths[0], combined.drop(columns=[*routes.columns, 'airline_id', 'from_airport_id', 'to_airport_id']).to_dict('records'))
+    write_routes(paths[1], combined[list(routes.columns)].to_dict('records'))
+    return paths
+
+
+def check_combined() -> bool:
+    '''
+    return: whether --DATA gives the same answers as the three files for the same routes, whichever questions were asked
+            before it, and whether split_combined gives every airline and airport one id that the routes refer to
+    '''
+    passed: bool = True
+    with tempfile.TemporaryDirectory() as directory:
+        for airports, questions in ((TABLE_FILES['airports'], STATE_QUESTIONS), (COORDINATES_FILE, DISTANCE_QUESTIONS)):
+            combined, routes = write_combined(directory, airports)
+            tables: list = absolute_tables(airports)[:2] + [f"--ROUTES={routes}"]
+            expected: dict = run_questions(directory, questions, *tables)
+            # each question alone reads fewer columns, so the cached tables are widened before all of them are asked at once
+            for asked in [(question,) for question in questions[:2]] + [questions]:
+                answers: dict = run_questions(directory, asked, f"--DATA={combined}")
+                for question in asked:
+                    if answers[question] != expected[question]:
+                        print_message(True, f"{question} from --DATA after {', '.join(asked)} differs from the three files")
+                        passed = False
+
+        source: pd.DataFrame = raw_table(combined, 'routes')
+        airlines, airports, routes = route_manager.split_combined(combined)
+        airports = airports.set_index('airport_id')
+        for table, df, column in ((airlines, airlines.set_index('airline_id'), 'airline_id'), (airports, airports, 'airport_id')):
+            if not (df.index.is_unique and set(df.index) == set(range(len(df)))):
+                print_message(True, f"split_combined did not number the rows of its {table} table by {column} from 0")
+                passed = False
+        for end, ids in (('from', routes['route_from_aiport_id']), ('to', routes['route_to_airport_id'])):
+            if airports.loc[ids, 'airport_icao_unique_code'].astype(str).tolist() != source[f"{end}_airport_icao_unique_code"].str.strip().tolist():
+                print_message(True, f"the {end} airport ids from split_combined do not name the airports of the document")
+                passed = False
+        countries: pd.DataFrame = route_manager.split_combined(combined, ('from_airport_country', 'to_airport_country'))[1]
+        if len(countries) != len(set(source['from_airport_country']) | set(source['to_airport_country'])):
+            print_message(True, "split_combined reading only the countries did not make one airport of each country")
+            passed = False
+    return passed
+
+
+def check_projection() -> bool:
+    '''
+    return: whether load_table keeps only the columns asked for, with the same values as loading every column, and
+            whether its cache holds every column asked for since the file last changed and is only reused when it has them
+    '''
+    full: pd.DataFrame = route_manager.parse_table(TABLE_FILES['airports'], 'airports')
+    passed: bool = True
+    with tempfile.TemporaryDirectory() as directory:
+        path: str = os.path.join(directory, TABLE_FILES['airports'])
+        shutil.copyfile(TABLE_FILES['airports'], path)
+        asked: set = set()
+        for columns, expected in PROJECTIONS:
+            df, cache = route_manager.load_cached(path, 'airports', lambda wanted: route_manager.parse_table(path, 'airports', wanted), columns)
+            df = route_manager.project(df, columns)
+            asked = None if columns is None or asked is None else asked | set(columns)
+            with open(path + route_manager.CACHE_SUFFIX, 'rb') as f:
+                cached: object = pickle.load(f)['columns']
+            if cache != expected or (None if cached is None else set(cached)) != asked:
+                print_message(True, f"loading {columns or 'every column'} was a cache {cache} holding {cached or 'every column'}, "
+                                    f"instead of a {expected} holding {sorted(asked) if asked else 'every column'}")
+                passed = False
+            if list(df.columns) != [column for column in full.columns if columns is None or column in columns] or not df.equals(full[df.columns]):
+                print_message(True, f"loading {columns or 'every column'} kept other columns or values than loading every column")
+                passed = False
+
+        with open(path, 'a') as f:                  # any change to the file makes the cache stale
+            f.write('\n')
+        if route_manager.load_cached(path, 'airports', lambda wanted: route_manager.parse_table(path, 'airports', wanted), ('airport_id',))[1] != 'miss':
+            print_message(True, "the cache was reused after the yaml file changed")
+            passed = False
+    return passed
+
+
+def check_columns() -> bool:
+    '''
+    return: whether the tables convert.py writes give the files in tests, and convert.py stops with an error on bad arguments
+    '''
+    program: str = os.path.abspath('convert.py')
+    with tempfile.TemporaryDirectory() as directory:
+        converted, coordinates = os.path.join(directory, 'converted'), os.path.join(directory, 'coordinates')
+        subprocess.run([sys.executable, program, *absolute_tables(), f"--OUTPUT={converted}"], cwd=directory, check=True, capture_output=True)
+        subprocess.run([sys.executable, program, f"--YAML={os.path.abspath(COORDINATES_FILE)}", '--TABLE=airports',
+                        f"--OUTPUT={os.path.join(coordinates, 'airports' + COLUMNS_SUFFIX)}"], cwd=directory, check=True, capture_output=True)
+        passed: bool = compare_answers(run_questions(directory, STATE_QUESTIONS, *columnar_tables(converted)), 'from columns')
+        tables: list = columnar_tables(converted)
+        tables[1] = columnar_tables(coordinates)[1]
+        passed &= compare_answers(run_questions(directory, DISTANCE_QUESTIONS, *tables), 'from columns')
+
+        for arguments in (absolute_tables(), ['--OUTPUT'], [f"--YAML={os.path.abspath(COORDINATES_FILE)}", f"--OUTPUT={directory}"]):
+            error: subprocess.CompletedProcess = subprocess.run([sys.executable, program, *arguments], cwd=directory, capture_output=True, text=True)
+            if error.returncode != 2 or 'convert.py: error:' not in error.stderr:
+                print_message(True, f"convert.py {' '.join(arguments)} did not stop with a usage error")
+                passed = False
+    return passed
+
+
+def search_hops(routes: dict, source: int) -> dict:
+    '''
+    param routes: a dictionary of the set of airports rows each airports row has a route to
+    param source: the airports row to start from
+    return: a dictionary of the fewest hops to each airports row that can be reached
+    '''
+    hops: dict = {source: 0}
+    queue: collections.deque = collections.deque([source])
+    while queue:
+        row: int = queue.popleft()
+        for target in routes.get(row, ()):
+            if target not in hops:
+                hops[target] = hops[row] + 1
+                queue.append(target)
+    return hops
+
+
+def check_graph() -> bool:
+    '''
+    return: whether q6 gives tests/q6.csv, and the route graph has the degrees, hops and connections of a plain python search
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        passed: bool = compare_answers(run_questions(directory, ('q6',), *absolute_tables()), 'q6')
+
+    db: route_manager.RouteDatabase = route_manager.RouteDatabase.load(*TABLE_FILES.values())
+    routes: dict = collections.defaultdict(set)
+    for origin, to in zip(db.route_from.tolist(), db.route_to.tolist()):
+        if origin >= 0 and to >= 0:
+            routes[origin].add(to)
+    degrees: np.ndarray = np.zeros(len(db.airports), dtype=np.int64)
+    for origin, targets in routes.items():
+        degrees[origin] += len(targets)
+        for to in targets:
+            degrees[to] += 1
+
+    graph: route_manager.RouteGraph = db.graph()
+    if not np.array_equal(graph.degrees(), degrees):
+        print_message(True, "the route graph counts different routes per airport than the routes")
+        passed = False
+    sources: list = random.Random(265).sample(sorted(routes), SEARCH_SOURCES)
+    for source in sources:
+        hops: dict = search_hops(routes, source)
+        expected: np.ndarray = np.full(len(db.airports), -1, dtype=np.int64)
+        expected[list(hops)] = list(hops.values())
+        if not np.array_equal(graph.reachable(source), expected):
+            print_message(True, f"the hops from airports row {source} differ from a plain python search")
+            passed = False
+        limited: np.ndarray = np.where(expected <= 2, expected, -1)
+        if not np.array_equal(graph.reachable(source, 2), limited):
+            print_message(True, f"the hops from airports row {source} within 2 hops differ from a plain python search")
+            passed = False
+        for target in (max(hops, key=hops.get), sources[0]):
+            path: list = graph.path(source, target)
+            if target not in hops:
+                valid: bool = path is None
+            else:                   # there can be several connections with the fewest hops, so any one of them is right
+                valid = (path is not None and path[0] == source and path[-1] == target and len(path) - 1 == hops[target]
+                         and all(b in routes[a] for a, b in zip(path, path[1:])))
+            if not valid:
+                print_message(True, f"the connection from airports row {source} to {target} is not one with the fewest hops")
+                passed = False
+    return passed
+
+
+def check_distances() -> bool:
+    '''
+    return: whether q7 to q10 give their files in tests, and q7 stops with an error naming the missing coordinate columns
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        passed: bool = compare_answers(run_questions(directory, DISTANCE_QUESTIONS, *absolute_tables(COORDINATES_FILE)), 'with coordinates')
+        error: subprocess.CompletedProcess = subprocess.run([sys.executable, os.path.abspath('route_manager.py'), '--QUESTION=q7',
+                                                             '--GRAPH_TYPE=bar', *absolute_tables()], cwd=directory, capture_output=True, text=True)
+    if error.returncode != 2 or 'airport_latitude' not in error.stderr:
+        print_message(True, "q7 without coordinates did not stop with an error naming the missing columns")
+        passed = False
+    return passed
+
+
+def write_routes(path: str, routes: list) -> None:
+    '''
+    param path: string that specifies the yaml file the routes are written to
+    param routes: the routes, as the dictionaries of the routes file
+    return: the file is written thus returns nothing
+    '''
+    with open(path, 'w') as f:
+        yaml.dump({'routes': routes}, f, Dumper=YamlDumper, sort_keys=False)
+
+
+def check_state() -> bool:
+    '''
+    return: whether the route counts give the files in tests when they are streamed, or saved and then updated,
+            whether the same update is refused the second time and a changed routes file is counted again, and whether
+            removing more routes than were added leaves them as they were
+    '''
+    with open(TABLE_FILES['routes']) as f:
+        routes: list = yaml.load(f, Loader=route_manager.yaml_loader())['routes']
+    passed: bool = True
+    with tempfile.TemporaryDirectory() as directory:
+        passed &= compare_answers(run_questions(directory, STATE_QUESTIONS, *absolute_tables(), '--CHUNK_SIZE=997'), 'streamed')
+
+        # the saved counts leave out the last routes and count the first ones twice, which the update puts right
+        base, added, removed = (os.path.join(directory, f"{name}.yaml") for name in ('base', 'added', 'removed'))
+        write_routes(base, routes[:-CHANGED_ROUTES] + routes[:CHANGED_ROUTES])
+        write_routes(added, routes[-CHANGED_ROUTES:])
+        write_routes(removed, routes[:CHANGED_ROUTES])
+        tables: list = absolute_tables()[:2] + [f"--ROUTES={base}", f"--STATE={os.path.join(directory, 'counts.pkl')}"]
+        run_questions(directory, STATE_QUESTIONS, *tables)
+        passed &= compare_answers(run_questions(directory, STATE_QUESTIONS, *tables, f"--ADDED_ROUTES={added}",
+                                                f"--REMOVED_ROUTES={removed}"), 'from updated counts')
+        passed &= compare_answers(run_questions(directory, STATE_QUESTIONS, *tables), 'from saved counts')
+
+        # applying the same update again would count its routes twice, so it must stop without saving anything
+        again: subprocess.CompletedProcess = subprocess.run([sys.executable, os.path.abspath('route_manager.py'), '--QUESTION=q1', '--GRAPH_TYPE=bar',
+                                                             *tables, f"--ADDED_ROUTES={added}"], cwd=directory, capture_output=True, text=True)
+        if again.returncode != 1 or 'already added' not in again.stderr:
+            print_message(True, "adding the same routes file to the saved counts twice did not stop with an error")
+            passed = False
+        passed &= compare_answers(run_questions(directory, STATE_QUESTIONS, *tables), 'from saved counts after a repeated update')
+
+        # once the routes file changes the saved counts are stale, so the routes file is counted again before the update
+        write_routes(base, routes[:-CHANGED_ROUTES])
+        write_routes(added, routes[-CHANGED_ROUTES:])
+        passed &= compare_answers(run_questions(directory, STATE_QUESTIONS, *tables, f"--ADDED_ROUTES={added}"), 'after the routes file changed')
+
+    db: route_manager.RouteDatabase = route_manager.RouteDatabase.load(*TABLE_FILES.values())
+    before: dict = {name: counts.copy() for name, counts in db.counts.state().items()}
+    try:
+        db.counts.remove(pd.concat([db.routes, db.routes.tail(1)]))
+        print_message(True, "removing more routes than were added did not raise a ValueError")
+        passed = False
+    except ValueError:
+        pass
+    db.counts.remove(db.routes.tail(CHANGED_ROUTES))
+    db.counts.add(db.routes.tail(CHANGED_ROUTES))
+    after: dict = db.counts.state()
+    if not (np.array_equal(before['to_airport'], after['to_airport']) and
+            all(before[name].sort_index().equals(after[name].sort_index()) for name in ('airline_country', 'route_pair'))):
+        print_message(True, "the route counts changed after a failed removal, or after removing and adding the same routes")
+        passed = False
+    return passed
+
+
+def check_index() -> bool:
+    '''
+    return: whether the airport index finds the same airports as measuring the distance to every airport, for airports
+            spread randomly over the earth and crowded around the poles and the antimeridian
+    '''
+    generator: np.random.Generator = np.random.default_rng(265)
+    latitude: np.ndarray = np.degrees(np.arcsin(generator.uniform(-1, 1, 5000)))        # spread evenly over the surface
+    longitude: np.ndarray = generator.uniform(-180, 180, 5000)
+    edges: np.ndarray = np.array(EDGE_POINTS)
+    latitude = np.concatenate([latitude, np.clip(edges[:, 0, None] + generator.normal(0, 0.5, (len(edges), 20)), -90, 90).ravel(), [np.nan]])
+    longitude = np.concatenate([longitude, ((edges[:, 1, None] + generator.normal(0, 0.5, (len(edges), 20)) + 180) % 360 - 180).ravel(), [0.0]])
+    index: route_manager.AirportIndex = route_manager.AirportIndex(latitude, longitude)
+    known: np.ndarray = np.flatnonzero(~np.isnan(latitude))
+
+    passed: bool = True
+    points: list = EDGE_POINTS + list(zip(np.degrees(np.arcsin(generator.uniform(-1, 1, SEARCH_POINTS))), generator.uniform(-180, 180, SEARCH_POINTS)))
+    for point_latitude, point_longitude in points:
+        distances: np.ndarray = route_manager.great_circle_km(point_latitude, point_longitude, latitude[known], longitude[known])
+        order: np.ndarray = np.lexsort((known, distances))
+        for radius in SEARCH_RADII:
+            rows, found = index.within(point_latitude, point_longitude, radius)
+            inside: np.ndarray = order[distances[order] <= radius]
+            if not (np.array_equal(rows, known[inside]) and np.allclose(found, distances[inside])):
+                print_message(True, f"the airports within {radius} km of ({point_latitude:.2f}, {point_longitude:.2f}) differ from measuring every airport")
+                passed = False
+        for k in (1, 7, len(known) + 1):
+            rows, found = index.nearest(point_latitude, point_longitude, k)
+            if len(found) != min(k, len(known)) or not np.allclose(found, distances[order[:k]]):    # airports as far apart can come in either order
+                print_message(True, f"the {k} airports nearest to ({point_latitude:.2f}, {point_longitude:.2f}) differ from measuring every airport")
+                passed = False
+    return passed
+
+
+class QuietRequestHandler(route_server.RouteRequestHandler):
+    '''
+    answers requests like route_server.py without logging each of them to stderr
+    '''
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def get(server: route_server.RouteServer, request: str) -> tuple:
+    '''
+    param server: the running server
+    param request: the path and query of the request
+    return: a tuple of the status of the response and its body
+    '''
+    url: str = f"http://{server.server_address[0]}:{server.server_address[1]}{request}"
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.read()
+
+
+def check_server() -> bool:
+    '''
+    return: whether the server gives the files in tests, connections and hops like the route graph, airports like the
+            airport index, and errors for bad requests
+    '''
+    db: route_manager.RouteDatabase = route_manager.RouteDatabase.load(TABLE_FILES['airlines'], COORDINATES_FILE, TABLE_FILES['routes'])
+    server: route_server.RouteServer = route_server.RouteServer(('127.0.0.1', 0), db)      # port 0 picks a free port
+    server.RequestHandlerClass = QuietRequestHandler
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    passed: bool = True
+    try:
+        for question in ('q7', 'q8'):
+            status, body = get(server, f"/{question}")
+            if status != 200 or body.decode() != expected_csv(question):
+                print_message(True, f"/{question} differs from {TEST_FILES_FOLDER}/{question}.csv")
+                passed = False
+
+        source, target = db.airport_row('CYYZ'), db.airport_row('YSSY')
+        status, body = get(server, '/path?from=CYYZ&to=YSSY')
+        answer: dict = json.loads(body)
+        codes: list = [airport['airport_icao_unique_code'] for airport in answer['airports']]
+        if status != 200 or answer['hops'] != db.graph().reachable(source)[target] or codes[0] != 'CYYZ' or codes[-1] != 'YSSY':
+            print_message(True, "/path from CYYZ to YSSY does not have the fewest hops")
+            passed = False
+        reached: np.ndarray = db.graph().reachable(source, 1)
+        status, body = get(server, f"/reachable?from={db.airports.index[source]}&hops=1")
+        ids: list = [airport['airport_id'] for airport in json.loads(body)['airports']]
+        if status != 200 or ids != db.airports.index[np.flatnonzero(reached > 0)].tolist():
+            print_message(True, "/reachable from CYYZ in 1 hop differs from the route graph")
+            passed = False
+
+        for request, (rows, distances) in (("/within?lat=49.2&lon=-123.2&radius=3500", db.airport_index().within(49.2, -123.2, 3500)),
+                                            ("/nearest?lat=-33.9&lon=151.2&k=3", db.airport_index().nearest(-33.9, 151.2, 3))):
+            status, body = get(server, request)
+            airports: list = json.loads(body)['airports']
+            if (status != 200 or [airport['airport_id'] for airport in airports] != db.airports.index[rows].tolist()
+                    or [airport['distance'] for airport in airports] != distances.round(1).tolist()):
+                print_message(True, f"{request} differs from the airport index")
+                passed = False
+
+        for request, expected in (('/q99', 404), ('/path?from=--5&to=CYYZ', 404), ('/reachable?from=CYYZ&hops=x', 400),
+                                  ('/within?lat=0&lon=0&radius=inf', 400), ('/nearest?lat=nan&lon=0&k=1', 400),
+                                  ('/within?lat=91&lon=0&radius=1', 400), ('/q1?limit=-1', 400), ('/q1?limit=0', 400),
+                                  ('/q1?country=canada', 400), ('/q1?country=Canada&format=pdf&graph=pie&limit=1', 200)):
+            status, body = get(server, request)
+            if status != expected:
+                print_message(True, f"{request} answered {status} instead of {expected}")
+                passed = False
+    finally:
+        server.shutdown()
+        server.server_close()
+    return passed
+
+CHECKS: dict = {                            # the function that runs each check, in the order they run
+    'graph': check_graph,
+    'distances': check_distances,
+    'state': check_state,
+    'profile': check_profile,
+    'joins': check_joins,
+    'combined': check_combined,
+    'projection': check_projection,
+    'columns': check_columns,
+    'index': check_index,
+    'server': check_server,
+}
+
+
+def main():
+    checks: list = sys.argv[1:] or list(CHECKS)
+    unknown: list = [check for check in checks if check not in CHECKS]
+    if unknown:
+        print_message(True, f"unknown check {', '.join(unknown)}. Usage: ./{PROGRAM_NAME}.py [{'] ['.join(CHECKS)}]")
+        sys.exit(2)
+
+    failed: list = []
+    for check in checks:
+        passed: bool = CHECKS[check]()
+        print_message(not passed, f"{check} {'passed' if passed else 'failed'}")
+        if not passed:
+            failed.append(check)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
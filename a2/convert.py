@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Converts the yaml files read by route_manager.py into its columnar layout, which route_manager.py memory maps instead of parsing
+Sample input: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --OUTPUT="columns"
+which writes columns/airlines.columns, columns/airports.columns and columns/routes.columns, to be used as
+--AIRLINES="columns/airlines.columns" --AIRPORTS="columns/airports.columns" --ROUTES="columns/routes.columns"
+
+A combined document is split into the same three directories with --DATA="../a3/routes-airlines-airports.yaml" --OUTPUT="columns"
+Any single table can be converted with --YAML="../a3/routes-airlines-airports.yaml" --TABLE="routes" --OUTPUT="combined.columns"
+The arguments are read the same way as by route_manager.py, and --help lists them all
+@author: doyeniyi
+"""
+import os
+import sys
+import argparse
+import route_manager
+
+TABLES: tuple = ('airlines', 'airports', 'routes')
+COLUMNS_SUFFIX: str = '.columns'                    # each table is written to its own directory named after it with this suffix
+
+
+def convert_table(path: str, table: str, directory: str) -> None:
+    '''
+    loads and cleans one table of a yaml file the same way route_manager.py does and writes it in the columnar layout
+
+    param path: string that specifies the yaml file
+    param table: string that specifies the top level key of the yaml file holding the table
+    param directory: string that specifies the directory the table is written to
+    return: the table is written thus returns nothing
+    '''
+    df = route_manager.load_table(path, table)
+    route_manager.write_columns(df, directory, table)
+    print(f"{path} -> {directory} ({len(df)} rows, {len(df.columns)} columns)")
+
+
+def parse_arguments(argv: list) -> argparse.Namespace:
+    '''
+    reads the command line arguments, which can be given in any order, and checks them before anything is converted
+
+    param argv: the command line arguments, without the program name
+    return: the arguments, named after their flags in lower case
+    '''
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="converts the yaml files of route_manager.py into its columnar layout")
+    route_manager.add_table_arguments(parser)
+    parser.add_argument('--YAML', dest='yaml', type=route_manager.existing_path, help="a yaml file to convert a single table of, named by --TABLE")
+    parser.add_argument('--TABLE', dest='table', help="the top level key of the table in --YAML")
+    parser.add_argument('--OUTPUT', dest='output', required=True, help="the directory the tables are written to, or the table's own directory with --YAML")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    if args.yaml is None and args.table is None:
+        route_manager.check_table_arguments(parser, args)
+    elif args.yaml is None or args.table is None:
+        parser.error("--YAML and --TABLE must be given together")
+    elif args.airlines or args.airports or args.routes or args.data:
+        parser.error("--YAML and --TABLE replace --AIRLINES, --AIRPORTS, --ROUTES and --DATA")
+    return args
+
+
+def main():
+    args: argparse.Namespace = parse_arguments(sys.argv[1:])                     # exits here on a bad argument, before anything is read
+
+    if args.yaml is not None:
+        convert_table(args.yaml, args.table, args.output)
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.data is not None:                                                     # one combined document instead of the three files
+        for table, df in zip(TABLES, route_manager.load_combined(args.data)):
+            directory: str = os.path.join(args.output, f"{table}{COLUMNS_SUFFIX}")
+            route_manager.write_columns(df, directory, table)
+            print(f"{args.data} -> {directory} ({len(df)} rows, {len(df.columns)} columns)")
+        return
+
+    for table, path in zip(TABLES, (args.airlines, args.airports, args.routes)):
+        convert_table(path, table, os.path.join(args.output, f"{table}{COLUMNS_SUFFIX}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,159 +4,1123 @@
 Created on Wed Feb 8 14:44:33 2023
 Based on: https://www.kaggle.com/datasets/arbazmohammad/world-airports-and-airlines-datasets
 Sample input: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --QUESTION="q1" --GRAPH_TYPE="bar"
+The three files can be replaced by one combined document like ../a3/routes-airlines-airports.yaml with --DATA="routes-airlines-airports.yaml"
+Several questions can be answered from one load with --QUESTION="q1,q3" or --QUESTION="all"
+Several graph types can be drawn with --GRAPH_TYPE="bar,pie", which names the pdf files q1_bar.pdf, q1_pie.pdf, ...
+Adding --CHUNK_SIZE=10000 streams the routes file 10000 routes at a time, keeping only the route counts in memory
+Adding --STATE="counts.pkl" saves the route counts to counts.pkl, and later runs read them back instead of the routes file.
+Then --ADDED_ROUTES="added.yaml" and --REMOVED_ROUTES="removed.yaml", in the layout of the routes file, update the
+saved counts with only the routes that changed. The counts are those of the routes file plus every file added or removed
+since, so applying the same file twice is an error, and the routes file is counted again when it changes
+--QUESTION="q6" ranks the hub airports by their number of distinct routes, from a graph of the routes built once
+--QUESTION="q7" and --QUESTION="q8" rank the longest routes and the countries with the longest routes by great circle
+distance, and q9 and q10 the shortest. They need airport_latitude and airport_longitude columns in the airports file,
+which the assignment's files do not have. "all" answers only the assignment's q1 to q5
+Adding --COUNTRY="France" or --LIMIT=5 changes the country or the number of rows of the questions asked
+Any of the yaml files can be replaced by a directory written by convert.py, which is memory mapped instead of parsed
+Adding --PROFILE="timings.json" writes the time, memory and row counts of each stage of the run to timings.json,
+and adding --PROFILE_MEMORY as well traces the peak memory python allocates in each stage, at the cost of a slower run
+The arguments can be given in any order, and --help lists them all
 @author: rivera
 @author: doyeniyi 
 """ 
+from __future__ import annotations          # annotations such as pd.DataFrame are not evaluated, so pandas is not imported for them
+import os
+import re
 import sys
-import yaml
-import pandas as pd
-import matplotlib.pyplot as plt
+import json
+import time
+import pickle
+import argparse
+import shutil
+import string
+import resource
+import threading
+import contextlib
+import tracemalloc
+import importlib.util
+from typing import NamedTuple
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def question1(airline_df: pd.DataFrame, airports_df: pd.DataFrame, routes_df: pd.DataFrame, question: str, graph_type: str) -> None:
+
+def lazy_import(name: str):
     '''
-    merges input data frames in order to obtain a data frame containing the top 20 airlines that offer the greatest number 
-    of routes with destination country as Canada
+    imports a module the first time one of its attributes is used instead of straight away, so a run that stops
+    before reading any data, such as one given a bad argument, never pays for importing it
 
-    param airline_df: dataframe containing formation on airlines
-    param airport_df: dataframe containing information on airports
-    param routes_df: dataframe containing formation on routes
-    param question: string the specifies what question this program has to answers
-    param graph_type: string the specifies what graph type the pdf file created should show
-    return: the program passes the final data frame to another function thus returns nothing
+    param name: the name of the module
+    return: the module, which loads itself when it is first used
     '''
-    airline_df.drop(['airline_country'], inplace=True, axis=1)
-    airports_df.drop(['airport_name', 'airport_city', 'airport_icao_unique_code', 'airport_altitude'], inplace=True, axis=1)
-    routes_df.drop(['route_from_aiport_id'], inplace=True, axis=1)
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
 
-    airports_df = airports_df[airports_df['airport_country']=='Canada']
 
-    routes_df = routes_df.rename(columns={'route_airline_id':'airline_id'})
-    answer: pd.DataFrame = routes_df.merge(airline_df, on='airline_id', how='inner') 
-    answer = answer.rename(columns={'route_to_airport_id':'airport_id'})
-    answer = answer.merge(airports_df, on='airport_id', how='inner') 
+yaml = lazy_import('yaml')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
 
-    answer = df_lstrip(answer,answer.columns)
-    answer = answer.groupby(['airline_name', 'airline_icao_unique_code'], as_index=False).size().sort_values(by=['size', 'airline_name'], ascending=[False, True]).head(20) 
-    process_data(answer, question, graph_type) 
-    
-def question2(airline_df: pd.DataFrame, airports_df: pd.DataFrame, routes_df: pd.DataFrame, question: str, graph_type: str) -> None:
+CACHE_SUFFIX: str = '.cache.pkl'                    # parsed tables are cached next to their yaml file with this suffix
+CACHE_VERSION: int = 5                              # bump whenever load_table changes what it stores
+STATE_VERSION: int = 2                              # bump whenever RouteCounts changes what it saves
+COLUMNS_VERSION: int = 1                            # bump whenever write_columns changes the layout of its directories
+COLUMNS_META: str = 'table.json'                    # the file in a columnar directory describing its table
+NULL_ID: int = -2**63                                             # what a missing id is stored as in a columnar directory, since -1 is a real id
+DELTA_CHUNK_SIZE: int = 10000                       # the most added or removed routes read at once
+COMBINE_KEYS: int = 1 << 20                         # the fewest keys RouteCounts gathers before adding them to its totals
+COLUMN_TYPES: dict = {                              # columns that are converted away from strings at load time, ids are
+    'airline_id': 'Int64',                          # nullable since the routes use \N for a missing id
+    'airport_id': 'Int64',
+    'route_airline_id': 'Int64',
+    'route_from_aiport_id': 'Int64',
+    'route_to_airport_id': 'Int64',
+    'airport_altitude': float,
+    'airport_latitude': float,                      # the coordinates are optional, only the distance questions read them
+    'airport_longitude': float,
+}
+CATEGORICAL_COLUMNS: tuple = (                      # repeated strings that are stored once as categories, with integer codes per row
+    'airline_name', 'airline_icao_unique_code', 'airline_country',
+    'airport_city', 'airport_country', 'airport_icao_unique_code',
+)
+ROUTE_COLUMNS: tuple = ('route_airline_id', 'route_from_aiport_id', 'route_to_airport_id')
+AIRLINE_COLUMNS: tuple = ('airline_name', 'airline_icao_unique_code', 'airline_country')
+AIRPORT_COLUMNS: tuple = ('airport_name', 'airport_city', 'airport_country', 'airport_icao_unique_code', 'airport_altitude')
+ROUTE_PAIR_COLUMNS: tuple = ('airport_icao_unique_code', 'airport_altitude')   # the airports columns of route_pairs
+COORDINATE_COLUMNS: tuple = ('airport_latitude', 'airport_longitude')          # in degrees, north and east are positive
+EARTH_RADIUS_KM: float = 6371.0                     # the mean radius of the earth, used for great circle distances
+GRID_DEGREES: float = 1.0                           # the size of a cell of AirportIndex, in degrees of latitude and longitude
+JOIN_AGGREGATES: dict = {                          # what each join of a query can aggregate, the counts of a join are named after its first
+    'airline': ('size',), 'destination': ('size',), 'hub': ('degree',), 'route': ('diff',), 'distance': ('distance', 'longest', 'shortest'),
+}
+JOIN_CACHE_SIZE: int = 32                           # the most join results a database keeps before dropping the least recently used
+
+
+class Query(NamedTuple):
+    '''
+    a declarative description of a question, which run_query plans and runs. the routes are joined to the table named
+    by join, kept if they go to country, grouped by keys and aggregated, then ordered by order and cut down to limit rows.
+    the remaining fields say how each row of the answer is written to the csv file and drawn on the chart
     '''
-    merges input data frames in order to obtain a data frame containing the top 30 countries with least appearances as destination country on the routes data
+    join: str               # 'airline' for each route's airline, 'destination' for its destination airport, 'route' for both of its airports,
+                            # 'hub' for each airport, 'distance' for both of its airports with the distance between them
+    keys: tuple             # the columns of the joined table to group by, which are also the columns of the answer
+    aggregate: str          # 'size' counts the routes in each group, 'diff' is the difference in altitude of each unique route,
+                            # 'degree' counts the distinct routes from or to the airports in each group, 'distance' is the
+                            # great circle distance of each unique route, and 'longest' and 'shortest' the longest and shortest
+                            # distance in each group
+    order: tuple            # (column, ascending) pairs to sort the answer by, starting with the aggregate
+    limit: int              # the number of rows in the answer
+    country: str            # only routes to this country are kept, for 'route' and 'distance' only routes from it too and for 'hub' only airports in it.
+                            # None keeps every route
+    subject: str            # format of the csv subject of each row, filled in from the answer's columns
+    label: str              # format of the chart label of each row
+    title: str              # format of the chart title, filled in from limit and country
+    xlabel: str
+    ylabel: str
+    country_title: str = None   # format of the chart title used instead of title when the question is asked about another country
 
-    param airline_df: dataframe containing formation on airlines
-    param airport_df: dataframe containing information on airports
-    param routes_df: dataframe containing formation on routes
-    param question: string the specifies what question this program has to answers
-    param graph_type: string the specifies what graph type the pdf file created should show
-    return: the program passes the final data frame to another function thus returns nothing
+
+QUERIES: dict = {                                   # the questions answered by --QUESTION, in the order they are answered
+    'q1': Query('airline', ('airline_name', 'airline_icao_unique_code'), 'size', (('size', False), ('airline_name', True)), 20, 'Canada',
+                "{airline_name} ({airline_icao_unique_code})", "{airline_name}",
+                "Top {limit} Airlines With The Greatest Number Of Routes To {country}", "Airlines", "Frequency"),
+    'q2': Query('destination', ('airport_country',), 'size', (('size', True), ('airport_country', True)), 30, None,
+                "{airport_country}", "{airport_country}",
+                "Top {limit} Countries With The Least Appearances As A Destination Country", "Countries", "Frequency"),
+    'q3': Query('destination', ('airport_name', 'airport_icao_unique_code', 'airport_city', 'airport_country'), 'size',
+                (('size', False), ('airport_name', True)), 10, None,
+                "\"{airport_name} ({airport_icao_unique_code}), {airport_city}, {airport_country}\"", "{airport_name} ({airport_icao_unique_code})",
+                "Top {limit} Destination Airports", "Airports", "Frequency"),
+    'q4': Query('destination', ('airport_city', 'airport_country'), 'size', (('size', False), ('airport_city', True)), 15, None,
+                "\"{airport_city}, {airport_country}\"", "{airport_city}, {airport_country}",
+                "Top {limit} Destination Cities", "Cities", "Frequency"),
+    'q5': Query('route', ('from_airport_icao_unique_code', 'to_airport_icao_unique_code'), 'diff',
+                (('diff', False), ('to_airport_icao_unique_code', True), ('from_airport_icao_unique_code', True)), 10, 'Canada',
+                "{from_airport_icao_unique_code}-{to_airport_icao_unique_code}", "{from_airport_icao_unique_code}-{to_airport_icao_unique_code}",
+                "Top {limit} Canadian Routes With The Greatest Difference In Altitude", "Routes", "Difference In Altitude",
+                "Top {limit} Routes Within {country} With The Greatest Difference In Altitude"),
+    'q6': Query('hub', ('airport_name', 'airport_icao_unique_code', 'airport_city', 'airport_country'), 'degree',
+                (('degree', False), ('airport_name', True)), 20, None,
+                "\"{airport_name} ({airport_icao_unique_code}), {airport_city}, {airport_country}\"", "{airport_name} ({airport_icao_unique_code})",
+                "Top {limit} Hub Airports By Number Of Distinct Routes", "Airports", "Distinct Routes"),
+    'q7': Query('distance', ('from_airport_icao_unique_code', 'to_airport_icao_unique_code'), 'distance',
+                (('distance', False), ('to_airport_icao_unique_code', True), ('from_airport_icao_unique_code', True)), 10, None,
+                "{from_airport_icao_unique_code}-{to_airport_icao_unique_code}", "{from_airport_icao_unique_code}-{to_airport_icao_unique_code}",
+                "Top {limit} Longest Routes", "Routes", "Distance (km)"),
+    'q8': Query('distance', ('from_airport_country',), 'longest', (('longest', False), ('from_airport_country', True)), 20, None,
+                "{from_airport_country}", "{from_airport_country}",
+                "Top {limit} Countries With The Longest Routes From Them", "Countries", "Longest Route (km)"),
+    'q9': Query('distance', ('from_airport_icao_unique_code', 'to_airport_icao_unique_code'), 'distance',
+                (('distance', True), ('to_airport_icao_unique_code', True), ('from_airport_icao_unique_code', True)), 10, None,
+                "{from_airport_icao_unique_code}-{to_airport_icao_unique_code}", "{from_airport_icao_unique_code}-{to_airport_icao_unique_code}",
+                "Top {limit} Shortest Routes", "Routes", "Distance (km)"),
+    'q10': Query('distance', ('from_airport_country',), 'shortest', (('shortest', True), ('from_airport_country', True)), 20, None,
+                 "{from_airport_country}", "{from_airport_country}",
+                 "Top {limit} Countries With The Shortest Routes From Them", "Countries", "Shortest Route (km)"),
+}
+QUESTIONS: tuple = tuple(QUERIES)
+ALL_QUESTIONS: tuple = ('q1', 'q2', 'q3', 'q4', 'q5')             # the questions of the assignment, whose answers tests/ holds
+GRAPH_TYPES: tuple = ('bar', 'pie')
+
+
+class Profiler:
+    '''
+    records the wall time, cpu time and resident memory of each stage of a run, along with the row counts going into
+    and coming out of it, and the peak memory allocated by python when memory tracing is asked for as well. tracing
+    every allocation slows a run down several times, so it is left off unless asked for. until enable is called
+    stage does nothing, so the stages can be marked without slowing normal runs
     '''
-    airline_df.drop(['airline_country', 'airline_name', 'airline_icao_unique_code'], inplace=True, axis=1)
-    airports_df.drop(['airport_name', 'airport_city', 'airport_icao_unique_code', 'airport_altitude'], inplace=True, axis=1)
-    routes_df.drop(['route_from_aiport_id'], inplace=True, axis=1)
 
-    routes_df = routes_df.rename(columns={'route_to_airport_id':'airport_id'})
-    answer = routes_df.merge(airports_df, on='airport_id', how='inner') 
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.memory: bool = False
+        self.stages: list = []
+        self.peaks: list = []                       # the highest peak seen so far by each open stage, innermost last
 
-    answer = df_lstrip(answer,answer.columns)
-    answer = answer.groupby(['airport_country'], as_index=False).size().sort_values(by=['size', 'airport_country']).head(30)
-    process_data(answer, question, graph_type) 
-     
+    def enable(self, memory: bool = False) -> None:
+        '''
+        starts recording stages
 
-def question3(airline_df: pd.DataFrame, airports_df: pd.DataFrame, routes_df: pd.DataFrame, question: str, graph_type: str) -> None:
+        param memory: whether to also start tracemalloc so the peak memory of each stage can be measured
+        '''
+        self.enabled = True
+        self.memory = memory
+        if memory:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **rows: int):
+        '''
+        records one stage of the run. a stage can be inside another, such as parsing inside loading, and the outer
+        stage's peak memory then includes the inner one's
+
+        param name: the name of the stage
+        param rows: row counts known before the stage runs
+        return: a context manager giving a dictionary that the stage can add its own row counts to
+        '''
+        record: dict = {'stage': name, **rows}
+        if not self.enabled:
+            yield record
+            return
+
+        if self.memory:
+            if self.peaks:                          # the peak is reset for this stage, so the outer stage keeps what it had so far
+                self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.peaks.append(0)
+        wall: float = time.perf_counter()
+        cpu: float = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            record['max_rss_kilobytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if self.memory:
+                record['peak_memory_bytes'] = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], record['peak_memory_bytes'])
+            self.stages.append(record)
+
+    def write(self, path: str) -> None:
+        '''
+        writes the recorded stages to a json file
+
+        param path: string that specifies the json file
+        return: the stages are written to the file thus returns nothing
+        '''
+        with open(path, 'w') as f:
+            json.dump({'stages': self.stages,
+                       'max_rss_kilobytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}, f, indent=2, default=int)
+
+
+profiler: Profiler = Profiler()                     # enabled by --PROFILE, the stages below are recorded through it
+
+
+class JoinCache:
+    '''
+    a bounded cache of join results shared by every query on a database, keyed on the tables joined, the keys they
+    are joined or grouped on and the filter applied, so queries that need the same join only build it once. when it
+    is full the least recently used result is dropped. it is safe to use from several threads, like those of route_server.py
     '''
-    merges input data frames in order to obtain a data frame containing the top 10 destination airports
 
-    param airline_df: dataframe containing formation on airlines
-    param airport_df: dataframe containing information on airports
-    param routes_df: dataframe containing formation on routes
-    param question: string the specifies what question this program has to answers
-    param graph_type: string the specifies what graph type the pdf file created should show
-    return: the program passes the final data frame to another function thus returns nothing
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self.results: OrderedDict = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: tuple, build):
+        '''
+        param key: a tuple of the left table, right table, keys and filter of the join
+        param build: a function without arguments that builds the join when it is not cached
+        return: the cached join, which must not be modified since later queries get the same object
+        '''
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return self.results[key]
+            self.misses += 1
+
+        result = build()                        # built outside the lock so other threads are not held up, at worst it is built twice
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.size:
+                self.results.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        '''
+        drops every cached join, for when the tables they were built from change
+        '''
+        with self.lock:
+            self.results.clear()
+
+
+class RouteCounts:
     '''
-    airline_df.drop(['airline_country', 'airline_name', 'airline_icao_unique_code'], inplace=True, axis=1)
-    airports_df.drop(['airport_altitude'], inplace=True, axis=1)
-    routes_df.drop(['route_from_aiport_id'], inplace=True, axis=1)
-    
-    routes_df = routes_df.rename(columns={'route_airline_id':'airline_id'})
-    answer: pd.DataFrame = routes_df.merge(airline_df, on='airline_id', how='left') 
-    answer = answer.rename(columns={'route_to_airport_id':'airport_id'})
-    answer = answer.merge(airports_df, on='airport_id', how='left') 
-    
-    answer = df_lstrip(answer,answer.columns)
-    answer = answer.groupby(['airport_name', 'airport_icao_unique_code', 'airport_city', 'airport_country'], as_index=False).size().sort_values(by=['size', 'airport_name'], ascending=[False, True]).head(10) 
-    process_data(answer, question, graph_type) 
+    running totals of the routes added so far, kept per destination airport, per pair of airline and destination
+    country and per pair of origin and destination airport instead of per route, so the memory used grows with the
+    number of distinct routes at most. every query is answered from these totals, whatever country it keeps, and
+    routes can be removed from them as well as added, so a change to the routes only costs as much as the change.
+    added routes are gathered and only added to the totals once there are about as many of them as there are totals,
+    or when the totals are read, so streaming many chunks does not merge every chunk into all of the totals
+    '''
+
+    def __init__(self, airlines: pd.DataFrame, airports: pd.DataFrame) -> None:
+        self.airlines: pd.DataFrame = airlines
+        self.airports: pd.DataFrame = airports
+        codes, self.countries = pd.factorize(airports['airport_country'])
+        self.airport_country: np.ndarray = np.append(codes, -1) + 1                            # 0 is an unknown country or airport
+        self.to_airport: np.ndarray = np.zeros(len(airports) + 1, dtype=np.int64)             # the last slot counts unknown ids
+        self.airline_country: pd.Series = pd.Series(dtype=np.int64)                           # indexed by airline row * width + country
+        self.route_pair: pd.Series = pd.Series(dtype=np.int64)                                # indexed by from row * airports + to row
+        self.pending_airline_country: list = []                                               # keys added since the totals were combined
+        self.pending_route_pair: list = []
+        self.pending_keys: int = 0
+        self.lock: threading.Lock = threading.Lock()                                          # the first reads may come from several threads
+
+    def add(self, routes_df: pd.DataFrame, sign: int = 1) -> None:
+        '''
+        adds a chunk of routes to the totals
+
+        param routes_df: dataframe containing formation on routes, with integer ids
+        param sign: 1 to add the routes, -1 to remove them
+        return: the totals are updated in place thus returns nothing
+        '''
+        self.add_positions(self.airlines.index.get_indexer(routes_df['route_airline_id']),
+                           self.airports.index.get_indexer(routes_df['route_from_aiport_id']),
+                           self.airports.index.get_indexer(routes_df['route_to_airport_id']), sign)
+
+    def remove(self, routes_df: pd.DataFrame) -> None:
+        '''
+        removes a chunk of routes that were added before from the totals
+
+        param routes_df: dataframe containing formation on routes, with integer ids
+        return: the totals are updated in place thus returns nothing
+        '''
+        self.add(routes_df, -1)
+
+    def add_positions(self, airline: np.ndarray, origin: np.ndarray, to: np.ndarray, sign: int = 1) -> None:
+        '''
+        adds routes that are already looked up to the totals
+
+        param airline: the airlines row of each route, -1 for an unknown airline
+        param origin: the airports row of each route's origin, -1 for an unknown airport
+        param to: the airports row of each route's destination, -1 for an unknown airport
+        param sign: 1 to add the routes, -1 to remove them
+        return: the totals are updated in place thus returns nothing, a ValueError is raised before anything changes
+                when a position is out of range or more routes are removed than were added
+        '''
+        for positions, rows in ((airline, len(self.airlines)), (origin, len(self.airports)), (to, len(self.airports))):
+            if len(positions) and (positions.min() < -1 or positions.max() >= rows):
+                raise ValueError("a route refers to a row that is not in the airlines or airports table")
+        to_counts: np.ndarray = np.bincount(to % len(self.to_airport), minlength=len(self.to_airport))     # -1 wraps around to the last slot
+        known: np.ndarray = (airline >= 0) & (to >= 0)
+        airline_keys: np.ndarray = airline[known] * self.width() + self.airport_country[to[known]]
+        known = (origin >= 0) & (to >= 0)
+        pair_keys: np.ndarray = origin[known] * len(self.airports) + to[known]
+
+        if sign > 0:                                # adding cannot make a total negative, so the keys wait to be combined
+            self.to_airport += to_counts
+            self.pending_airline_country.append(airline_keys)
+            self.pending_route_pair.append(pair_keys)
+            self.pending_keys += len(airline_keys) + len(pair_keys)
+            if self.pending_keys > max(COMBINE_KEYS, len(self.airline_country) + len(self.route_pair)):
+                self.combine()
+            return
+
+        self.combine()                              # removals are checked against every total before any of them change
+        to_airport: np.ndarray = self.to_airport - to_counts
+        airline_country: pd.Series = add_keys(self.airline_country, airline_keys, -1)
+        route_pair: pd.Series = add_keys(self.route_pair, pair_keys, -1)
+        if to_airport.min() < 0 or (airline_country < 0).any() or (route_pair < 0).any():
+            raise ValueError("more routes were removed than were added")
+        self.to_airport, self.airline_country, self.route_pair = to_airport, airline_country, route_pair
+
+    def combine(self) -> None:
+        '''
+        adds the keys gathered by add_positions to the totals, all in one merge
+
+        return: the totals are updated in place thus returns nothing
+        '''
+        with self.lock:
+            if not self.pending_route_pair:
+                return
+            self.airline_country = add_keys(self.airline_country, np.concatenate(self.pending_airline_country), 1)
+            self.route_pair = add_keys(self.route_pair, np.concatenate(self.pending_route_pair), 1)
+            self.pending_airline_country, self.pending_route_pair, self.pending_keys = [], [], 0
+
+    def state(self) -> dict:
+        '''
+        return: a dictionary of the totals, which restore puts back
+        '''
+        self.combine()
+        return {'to_airport': self.to_airport, 'airline_country': self.airline_country, 'route_pair': self.route_pair}
+
+    def restore(self, state: dict) -> None:
+        '''
+        puts back totals saved by state, which must have been counted against the same airlines and airports
 
-def question4(airports_df: pd.DataFrame, routes_df: pd.DataFrame, question: str, graph_type: str) -> None:
+        param state: a dictionary from state
+        return: the totals are replaced thus returns nothing
+        '''
+        self.to_airport = state['to_airport']
+        self.airline_country = state['airline_country']
+        self.route_pair = state['route_pair']
+        self.pending_airline_country, self.pending_route_pair, self.pending_keys = [], [], 0
+
+    def width(self) -> int:
+        '''
+        return: the number of country codes, including 0 for an unknown country
+        '''
+        return len(self.countries) + 1
+
+    def country_code(self, country: str) -> int:
+        '''
+        param country: the name of a country
+        return: the code of the country in airport_country, or -1 when no airport is in it
+        '''
+        return self.countries.get_loc(country) + 1 if country in self.countries else -1
+
+    def destinations(self, country: str = None) -> np.ndarray:
+        '''
+        param country: when given only the airports in this country are counted
+        return: the number of routes to each airports row
+        '''
+        if country is None:
+            return self.to_airport[:-1]
+        return np.where(self.airport_country[:-1] == self.country_code(country), self.to_airport[:-1], 0)
+
+    def airline_routes(self, country: str = None) -> np.ndarray:
+        '''
+        param country: when given only routes to this country are counted
+        return: the number of routes to a known airport flown by each airlines row
+        '''
+        self.combine()
+        pairs: pd.Series = self.airline_country
+        if country is not None:
+            pairs = pairs[pairs.index % self.width() == self.country_code(country)]
+        return np.bincount(pairs.index // self.width(), weights=pairs.to_numpy(), minlength=len(self.airlines)).astype(np.int64)
+
+    def airport_pairs(self) -> tuple:
+        '''
+        return: a tuple of the origin and destination airports rows of each distinct route between two known airports
+        '''
+        self.combine()
+        pairs: np.ndarray = self.route_pair.index.to_numpy(dtype=np.int64)
+        return pairs // len(self.airports), pairs % len(self.airports)
+
+
+class RouteGraph:
+    '''
+    the distinct routes as a directed graph over the rows of the airports table, stored as compressed sparse rows: the
+    destinations of airport row i are targets[offsets[i]:offsets[i + 1]]. a breadth first search then moves a whole
+    hop at a time with a few array operations, instead of merging the routes with the airports once per hop
     '''
-    merges input data frames in order to obtain a data frame containing the top 15 destination cities 
 
-    param airport_df: dataframe containing information on airports
-    param routes_df: dataframe containing formation on routes
-    param question: string the specifies what question this program has to answers
-    param graph_type: string the specifies what graph type the pdf file created should show
-    return: the program passes the final data frame to another function thus returns nothing
+    def __init__(self, origin: np.ndarray, to: np.ndarray, size: int) -> None:
+        '''
+        param origin: the airports row of each distinct route's origin, like the first array of RouteCounts.airport_pairs
+        param to: the airports row of each distinct route's destination
+        param size: the number of rows in the airports table
+        '''
+        self.size: int = size
+        self.offsets: np.ndarray = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origin, minlength=size), out=self.offsets[1:])
+        self.targets: np.ndarray = to[np.argsort(origin, kind='stable')]
+        self.in_degree: np.ndarray = np.bincount(to, minlength=size)
+
+    def out_degree(self) -> np.ndarray:
+        '''
+        return: the number of airports each airports row has a route to
+        '''
+        return np.diff(self.offsets)
+
+    def degrees(self) -> np.ndarray:
+        '''
+        return: the number of distinct routes from or to each airports row
+        '''
+        return self.out_degree() + self.in_degree
+
+    def expand(self, nodes: np.ndarray) -> tuple:
+        '''
+        param nodes: airports rows
+        return: a tuple of the origin and destination airports rows of every route leaving one of the nodes
+        '''
+        starts: np.ndarray = self.offsets[nodes]
+        lengths: np.ndarray = self.offsets[nodes + 1] - starts
+        return np.repeat(nodes, lengths), self.targets[concatenated_ranges(starts, lengths)]
+
+    def search(self, source: int, target: int = -1, max_hops: int = None) -> tuple:
+        '''
+        searches the graph breadth first from one airport, one hop at a time
+
+        param source: the airports row to start from
+        param target: when given the search stops at the hop that reaches this airports row
+        param max_hops: when given the search stops after this many hops
+        return: a tuple of the fewest hops to each airports row and the row each was first reached from, both -1 when unreached
+        '''
+        hops: np.ndarray = np.full(self.size, -1, dtype=np.int64)
+        parents: np.ndarray = np.full(self.size, -1, dtype=np.int64)
+        hops[source] = 0
+        frontier: np.ndarray = np.array([source], dtype=np.int64)
+        depth: int = 0
+        while len(frontier) and (target < 0 or hops[target] < 0) and (max_hops is None or depth < max_hops):
+            depth += 1
+            origins, targets = self.expand(frontier)
+            unseen: np.ndarray = hops[targets] < 0
+            frontier, first = np.unique(targets[unseen], return_index=True)
+            hops[frontier] = depth
+            parents[frontier] = origins[unseen][first]
+        return hops, parents
+
+    def path(self, source: int, target: int) -> list:
+        '''
+        param source: the airports row to start from
+        param target: the airports row to get to
+        return: the airports rows of one of the connections with the fewest hops, from source to target, or None when there is none
+        '''
+        hops, parents = self.search(source, target)
+        if hops[target] < 0:
+            return None
+        rows: list = [target]
+        while rows[-1] != source:
+            rows.append(int(parents[rows[-1]]))
+        return rows[::-1]
+
+    def reachable(self, source: int, max_hops: int = None) -> np.ndarray:
+        '''
+        param source: the airports row to start from
+        param max_hops: when given only airports this many hops away or fewer are kept
+        return: the fewest hops from source to each airports row, -1 for the rows that cannot be reached
+        '''
+        return self.search(source, max_hops=max_hops)[0]
+
+
+class AirportIndex:
+    '''
+    a grid over the airports with coordinates, for finding the airports near a point without measuring the distance
+    to all of them. the airports are sorted by the cell they are in, cells being GRID_DEGREES of latitude by
+    GRID_DEGREES of longitude, so the airports of cell i are rows[offsets[i]:offsets[i + 1]]. a search only measures
+    the airports in the cells that overlap the bounding box of the circle it searches
     '''
-    airports_df.drop(['airport_altitude', 'airport_icao_unique_code', 'airport_name'], inplace=True, axis=1)
-    routes_df.drop(['route_from_aiport_id'], inplace=True, axis=1)
 
-    airports_df = airports_df.rename(columns={'airport_id':'route_to_airport_id'})
-    answer: pd.DataFrame = routes_df.merge(airports_df, on='route_to_airport_id', how='inner') 
-    
-    answer = df_lstrip(answer,answer.columns)
-    answer = answer.groupby(['airport_city', 'airport_country'], as_index=False).size().sort_values(by=['size', 'airport_city'], ascending=[False, True]).head(15) 
-    process_data(answer, question, graph_type) 
+    def __init__(self, latitude: np.ndarray, longitude: np.ndarray, cell_degrees: float = GRID_DEGREES) -> None:
+        '''
+        param latitude: the latitude of each airports row in degrees, nan when it is unknown
+        param longitude: the longitude of each airports row in degrees, nan when it is unknown
+        param cell_degrees: the size of each cell in degrees
+        '''
+        self.cell_degrees: float = cell_degrees
+        self.bands: int = int(np.ceil(180 / cell_degrees))
+        self.columns: int = int(np.ceil(360 / cell_degrees))
+        known: np.ndarray = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+        cells: np.ndarray = self.cell(latitude[known], longitude[known])
+        order: np.ndarray = np.argsort(cells, kind='stable')
+        self.rows: np.ndarray = known[order]                        # airports without coordinates are left out of the grid
+        self.latitude: np.ndarray = latitude[self.rows]
+        self.longitude: np.ndarray = longitude[self.rows]
+        self.offsets: np.ndarray = np.zeros(self.bands * self.columns + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.bands * self.columns), out=self.offsets[1:])
+
+    def cell(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        '''
+        param latitude: latitudes in degrees
+        param longitude: longitudes in degrees
+        return: the cell each point is in
+        '''
+        band: np.ndarray = np.clip(((latitude + 90) // self.cell_degrees).astype(np.int64), 0, self.bands - 1)
+        column: np.ndarray = ((longitude + 180) // self.cell_degrees).astype(np.int64) % self.columns
+        return band * self.columns + column
 
-def question5(airline_df: pd.DataFrame, airports_df: pd.DataFrame, routes_df: pd.DataFrame, question: str, graph_type: str) -> None:
+    def candidates(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        '''
+        param latitude: the latitude of the centre of the circle in degrees
+        param longitude: the longitude of the centre of the circle in degrees
+        param radius: the radius of the circle in km
+        return: the positions in rows of the airports in the cells that overlap the bounding box of the circle
+        '''
+        angle: float = radius / EARTH_RADIUS_KM                     # the radius as an angle at the centre of the earth
+        south: float = latitude - np.degrees(angle)
+        north: float = latitude + np.degrees(angle)
+        bands: np.ndarray = np.arange(max(int((south + 90) // self.cell_degrees), 0), min(int((north + 90) // self.cell_degrees), self.bands - 1) + 1)
+        columns: np.ndarray = np.arange(self.columns)
+        if south > -90 and north < 90:                              # a circle around a pole covers every longitude
+            width: float = np.degrees(np.arcsin(min(np.sin(angle) / np.cos(np.radians(latitude)), 1.0)))
+            first: int = int((longitude - width + 180) // self.cell_degrees)
+            last: int = int((longitude + width + 180) // self.cell_degrees)
+            if last - first + 1 < self.columns:
+                columns = np.arange(first, last + 1) % self.columns # the box can wrap around the antimeridian
+        cells: np.ndarray = (bands[:, None] * self.columns + columns[None, :]).ravel()
+        return concatenated_ranges(self.offsets[cells], self.offsets[cells + 1] - self.offsets[cells])
+
+    def within(self, latitude: float, longitude: float, radius: float) -> tuple:
+        '''
+        param latitude: the latitude of the point in degrees
+        param longitude: the longitude of the point in degrees
+        param radius: the greatest distance from the point in km
+        return: a tuple of the airports rows within radius of the point and their distances in km, nearest first
+        '''
+        radius = min(radius, np.pi * EARTH_RADIUS_KM)              # half way round the earth already reaches every airport
+        positions: np.ndarray = self.candidates(latitude, longitude, radius)
+        distances: np.ndarray = great_circle_km(latitude, longitude, self.latitude[positions], self.longitude[positions])
+        inside: np.ndarray = distances <= radius
+        positions, distances = positions[inside], distances[inside]
+        order: np.ndarray = np.lexsort((self.rows[positions], distances))
+        return self.rows[positions[order]], distances[order]
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> tuple:
+        '''
+        finds the nearest airports by searching circles that double in radius until one holds k airports, since
+        the k nearest airports must all be in the first circle that holds that many
+
+        param latitude: the latitude of the point in degrees
+        param longitude: the longitude of the point in degrees
+        param k: the number of airports wanted
+        return: a tuple of the k airports rows nearest to the point and their distances in km, nearest first
+        '''
+        radius: float = np.radians(self.cell_degrees) * EARTH_RADIUS_KM
+        while True:
+            rows, distances = self.within(latitude, longitude, radius)
+            if len(rows) >= k or radius >= np.pi * EARTH_RADIUS_KM:    # half way round the earth reaches every airport
+                return rows[:k], distances[:k]
+            radius *= 2
+
+
+class RouteDatabase:
+    '''
+    the airline, airport and route tables of one run. airlines and airports are indexed by their integer id, and the
+    airline, origin airport and destination airport row of every route is looked up once when the database is created,
+    so the questions can select rows by position instead of merging the tables again
     '''
-    merges input data frames in order to obtain a data frame containing the top 10 unique Canadian routes
-    with the most distance between origin and destination altitudes
 
-    param airline_df: dataframe containing formation on airlines
-    param airport_df: dataframe containing information on airports
-    param routes_df: dataframe containing formation on routes
+    def __init__(self, airline_df: pd.DataFrame, airports_df: pd.DataFrame, routes_df: pd.DataFrame) -> None:
+        with profiler.stage('join', routes_in=len(routes_df), airlines_in=len(airline_df), airports_in=len(airports_df)) as record:
+            self.airlines: pd.DataFrame = airline_df.set_index('airline_id')
+            self.airports: pd.DataFrame = airports_df.set_index('airport_id')
+            for table, df in (('airlines', self.airlines), ('airports', self.airports)):
+                if not df.index.is_unique:          # a route could not tell which of the rows it refers to
+                    duplicated: list = df.index[df.index.duplicated()].unique().tolist()
+                    raise ValueError(f"the {table} table has more than one row with the id {', '.join(map(str, duplicated[:10]))}"
+                                     + (f" and {len(duplicated) - 10} more" if len(duplicated) > 10 else ''))
+            self.routes: pd.DataFrame = routes_df
+            self.route_airline: np.ndarray = self.airlines.index.get_indexer(routes_df['route_airline_id'])    # -1 marks an id that is not in the table
+            self.route_from: np.ndarray = self.airports.index.get_indexer(routes_df['route_from_aiport_id'])
+            self.route_to: np.ndarray = self.airports.index.get_indexer(routes_df['route_to_airport_id'])
+            self.counts: RouteCounts = RouteCounts(self.airlines, self.airports)
+            self.joins: JoinCache = JoinCache(JOIN_CACHE_SIZE)
+            self.deltas: list = []                                              # the delta_key of each file update added or removed
+            self.counts.add_positions(self.route_airline, self.route_from, self.route_to)
+            record['routes_out_with_airline'] = (self.route_airline >= 0).sum()
+            record['routes_out_with_from_airport'] = (self.route_from >= 0).sum()
+            record['routes_out_with_to_airport'] = (self.route_to >= 0).sum()
+
+    @classmethod
+    def load(cls, airline: str, airports: str, routes: str, columns: dict = None) -> 'RouteDatabase':
+        '''
+        creates the database from the three yaml files
+
+        param airline: string that specifies the airlines yaml file
+        param airports: string that specifies the airports yaml file
+        param routes: string that specifies the routes yaml file
+        param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+        return: the loaded database
+        '''
+        columns = columns or {}
+        return cls(load_table(airline, 'airlines', columns.get('airlines')), load_table(airports, 'airports', columns.get('airports')),
+                   load_table(routes, 'routes', columns.get('routes')))
+
+    @classmethod
+    def load_combined(cls, path: str, columns: dict = None) -> 'RouteDatabase':
+        '''
+        creates the database from one combined yaml document, where each route names its airline and airports
+
+        param path: string that specifies the combined yaml file
+        param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+        return: the loaded database
+        '''
+        return cls(*load_combined(path, columns))
+
+    @classmethod
+    def empty(cls, airline: str, airports: str, columns: dict = None) -> 'RouteDatabase':
+        '''
+        creates the database without any routes, for them to be added to its counts afterwards
+
+        param airline: string that specifies the airlines yaml file
+        param airports: string that specifies the airports yaml file
+        param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+        return: the loaded database, with an empty routes table
+        '''
+        columns = columns or {}
+        return cls(load_table(airline, 'airlines', columns.get('airlines')), load_table(airports, 'airports', columns.get('airports')),
+                   clean_frame(pd.DataFrame(columns=ROUTE_COLUMNS)))
+
+    @classmethod
+    def stream(cls, airline: str, airports: str, routes: str, chunk_size: int, columns: dict = None) -> 'RouteDatabase':
+        '''
+        creates the database without keeping the routes. they are read chunk_size at a time and only added to the
+        counts, so memory does not grow with the length of the routes file, only with its number of distinct routes
+
+        param airline: string that specifies the airlines yaml file
+        param airports: string that specifies the airports yaml file
+        param routes: string that specifies the routes yaml file
+        param chunk_size: the number of routes read before they are added to the counts
+        param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+        return: the loaded database, with an empty routes table
+        '''
+        db: RouteDatabase = cls.empty(airline, airports, columns)
+        with profiler.stage('stream routes', chunk_size=chunk_size) as record:
+            record['routes_in'] = 0
+            for chunk in iter_table_chunks(routes, 'routes', chunk_size, ROUTE_COLUMNS):
+                db.counts.add(chunk)
+                record['routes_in'] += len(chunk)
+        db.joins.clear()                                # nothing should be cached from before the routes were added, but just in case
+        return db
+
+    @classmethod
+    def restore(cls, airline: str, airports: str, routes: str, state: str, columns: dict = None) -> 'RouteDatabase':
+        '''
+        creates the database from route counts saved by save instead of from the routes file. the counts are only used
+        when they were saved against the same airlines and airports files, since they count rows of those tables, and
+        the same routes file, since the routes they count are those of that file plus the updates applied since
+
+        param airline: string that specifies the airlines yaml file
+        param airports: string that specifies the airports yaml file
+        param routes: string that specifies the routes yaml file the counts were first counted from
+        param state: string that specifies the file the counts were saved to
+        param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+        return: the database with an empty routes table and the saved counts, or None when there are no usable saved counts
+        '''
+        with profiler.stage('restore state') as record:
+            try:
+                with open(state, 'rb') as f:
+                    saved: dict = pickle.load(f)
+            except Exception:                   # a missing or unreadable state just means counting the routes file again
+                record['state'] = 'missing'
+                return None
+            if saved['key'] != state_key(airline, airports, routes):
+                record['state'] = 'stale'
+                return None
+
+            db: RouteDatabase = cls.empty(airline, airports, columns)
+            db.counts.restore(saved['counts'])
+            db.deltas = saved['deltas']
+            record['state'] = 'restored'
+            return db
+
+    def save(self, airline: str, airports: str, routes: str, state: str) -> None:
+        '''
+        saves the route counts, and the updates applied to them, so restore can use them on a later run
+
+        param airline: string that specifies the airlines yaml file the database was loaded from
+        param airports: string that specifies the airports yaml file the database was loaded from
+        param routes: string that specifies the routes yaml file the counts were first counted from
+        param state: string that specifies the file the counts are saved to
+        return: the counts are saved thus returns nothing
+        '''
+        with profiler.stage('save state'):
+            write_pickle(state, {'key': state_key(airline, airports, routes), 'counts': self.counts.state(), 'deltas': self.deltas})
+
+    def update(self, added: str = None, removed: str = None) -> None:
+        '''
+        adds and removes routes from the counts, reading only the routes that changed, and drops the joins cached
+        from the old counts
+
+        param added: string that specifies a yaml file of routes to add, in the layout of the routes file
+        param removed: string that specifies a yaml file of routes to remove, in the layout of the routes file
+        return: the counts are updated in place thus returns nothing, a ValueError is raised before anything changes
+                when either file was already added or removed, unchanged, since it would count its routes twice
+        '''
+        updates: list = [(path, sign, count, delta_key(path, sign)) for path, sign, count in
+                         ((added, 1, 'routes_added'), (removed, -1, 'routes_removed')) if path is not None]
+        for path, sign, count, key in updates:
+            if key in self.deltas:
+                raise ValueError(f"{path} was already {'added to' if sign > 0 else 'removed from'} these route counts")
+        with profiler.stage('update routes') as record:
+            record['routes_added'] = record['routes_removed'] = 0
+            for path, sign, count, key in updates:
+                for chunk in iter_table_chunks(path, 'routes', DELTA_CHUNK_SIZE, ROUTE_COLUMNS):
+                    self.counts.add(chunk, sign)
+                    record[count] += len(chunk)
+                self.deltas.append(key)
+            self.joins.clear()
+
+    def route_mask(self, positions: np.ndarray, selected: pd.Series) -> np.ndarray:
+        '''
+        finds the routes whose airline or airport at the given positions is one of the selected rows
+
+        param positions: one of route_airline, route_from or route_to, or airports rows from RouteCounts.airport_pairs
+        param selected: a boolean series over the rows of the airlines or airports table that positions points into
+        return: a boolean array over the routes
+        '''
+        return np.append(selected.to_numpy(dtype=bool), False)[positions]     # the appended False is what the -1 of an unknown id reads
+
+    def route_pairs(self, country: str = None) -> pd.DataFrame:
+        '''
+        looks up both airports of every distinct route, or of every distinct route within a country. the result is cached in joins
+
+        param country: when given only routes from and to airports in this country are kept
+        return: a data frame of the icao codes and altitudes of both airports of each route and their difference as diff
+        '''
+        return self.joins.get(('routes', 'airports', ('route_from_aiport_id', 'route_to_airport_id'), country),
+                              lambda: self.build_route_pairs(country))
+
+    def country_pairs(self, country: str = None) -> tuple:
+        '''
+        param country: when given only routes from and to airports in this country are kept
+        return: a tuple of the origin and destination airports rows of each distinct route between two known airports
+        '''
+        if country is None:
+            in_country: pd.Series = pd.Series(True, index=self.airports.index)
+        else:
+            in_country: pd.Series = self.airports['airport_country']==country
+        origin, to = self.counts.airport_pairs()                    # routes flown several times only need to be looked up once
+        routes: np.ndarray = self.route_mask(to, in_country) & self.route_mask(origin, in_country)
+        return origin[routes], to[routes]
+
+    def build_route_pairs(self, country: str = None) -> pd.DataFrame:
+        '''
+        param country: when given only routes from and to airports in this country are kept
+        return: the uncached result of route_pairs
+        '''
+        origin, to = self.country_pairs(country)
+        to_airports: pd.DataFrame = self.airports.take(to)
+        from_airports: pd.DataFrame = self.airports.take(origin)
+
+        pairs: pd.DataFrame = pd.DataFrame({'to_airport_icao_unique_code': to_airports['airport_icao_unique_code'].to_numpy(),
+                                            'to_airport_altitude': to_airports['airport_altitude'].to_numpy(),
+                                            'from_airport_icao_unique_code': from_airports['airport_icao_unique_code'].to_numpy(),
+                                            'from_airport_altitude': from_airports['airport_altitude'].to_numpy()})
+        return column_diff(pairs, 'to_airport_altitude', 'from_airport_altitude', 'diff')
+
+    def route_distances(self, country: str = None) -> pd.DataFrame:
+        '''
+        finds the great circle distance of every distinct route, or of every distinct route within a country. the result is cached in joins
+
+        param country: when given only routes from and to airports in this country are kept
+        return: a data frame of the icao codes and countries of both airports of each route and the distance between them in km as distance
+        '''
+        return self.joins.get(('routes', 'airports', COORDINATE_COLUMNS, country), lambda: self.build_route_distances(country))
+
+    def build_route_distances(self, country: str = None) -> pd.DataFrame:
+        '''
+        param country: when given only routes from and to airports in this country are kept
+        return: the uncached result of route_distances, a ValueError is raised when the airports have no coordinates
+        '''
+        origin, to = self.country_pairs(country)
+        latitude, longitude = self.coordinates()
+        to_airports: pd.DataFrame = self.airports.take(to)
+        from_airports: pd.DataFrame = self.airports.take(origin)
+
+        distances: pd.DataFrame = pd.DataFrame({'to_airport_icao_unique_code': to_airports['airport_icao_unique_code'].to_numpy(),
+                                                'to_airport_country': to_airports['airport_country'].to_numpy(),
+                                                'from_airport_icao_unique_code': from_airports['airport_icao_unique_code'].to_numpy(),
+                                                'from_airport_country': from_airports['airport_country'].to_numpy(),
+                                                'distance': great_circle_km(latitude[origin], longitude[origin], latitude[to], longitude[to]).round(1)})
+        return distances[distances['distance'].notna()]             # routes to an airport without coordinates have no distance
+
+    def coordinates(self) -> tuple:
+        '''
+        return: a tuple of the latitude and longitude of each airports row in degrees, a ValueError is raised when the airports have no coordinates
+        '''
+        missing: list = [column for column in COORDINATE_COLUMNS if column not in self.airports.columns]
+        if missing:
+            raise ValueError(f"the airports have no {' or '.join(missing)} column, which distances need")
+        return tuple(self.airports[column].to_numpy(dtype=np.float64) for column in COORDINATE_COLUMNS)
+
+    def airport_index(self) -> AirportIndex:
+        '''
+        return: the grid over the coordinates of the airports. the result is cached in joins
+        '''
+        return self.joins.get(('airports', 'index', COORDINATE_COLUMNS, None), lambda: AirportIndex(*self.coordinates()))
+
+    def grouped_distances(self, keys: tuple, country: str = None) -> pd.DataFrame:
+        '''
+        groups the routes from route_distances. the result is cached in joins
+
+        param keys: the columns of route_distances to group by
+        param country: when given only routes from and to airports in this country are kept
+        return: a data frame of the groups, with the distance of their longest route as longest and of their shortest as shortest
+        '''
+        return self.joins.get(('distance', 'groups', tuple(keys), country),
+                              lambda: self.route_distances(country).groupby(list(keys), as_index=False, observed=True)
+                                                                   .agg(longest=('distance', 'max'), shortest=('distance', 'min')))
+
+    def graph(self) -> RouteGraph:
+        '''
+        return: the distinct routes as a graph over the rows of the airports table. the result is cached in joins
+        '''
+        return self.joins.get(('routes', 'graph', ('route_from_aiport_id', 'route_to_airport_id'), None),
+                              lambda: RouteGraph(*self.counts.airport_pairs(), len(self.airports)))
+
+    def hub_degrees(self, country: str = None) -> np.ndarray:
+        '''
+        param country: when given only the airports in this country are counted
+        return: the number of distinct routes from or to each airports row
+        '''
+        degrees: np.ndarray = self.graph().degrees()
+        if country is None:
+            return degrees
+        return np.where(self.counts.airport_country[:-1] == self.counts.country_code(country), degrees, 0)
+
+    def check_country(self, country: str) -> None:
+        '''
+        param country: the name of a country a question is asked about, or None for the question's own
+        return: the country is checked thus returns nothing, a ValueError is raised when no airport is in the country
+        '''
+        if country is None or self.counts.country_code(country) >= 0:
+            return
+        close: list = [known for known in self.counts.countries if known.casefold() == country.casefold()]
+        raise ValueError(f"no airport is in the country {country}" + (f", did you mean {close[0]}?" if close else ''))
+
+    def airport_row(self, code: str) -> int:
+        '''
+        param code: the id or the icao code of an airport
+        return: the row of the airport in the airports table, or -1 when there is no such airport
+        '''
+        if re.fullmatch(r'-?[0-9]+', code):
+            return int(self.airports.index.get_indexer([int(code)])[0])
+        rows: np.ndarray = np.flatnonzero(self.airports['airport_icao_unique_code'].to_numpy() == code)
+        return int(rows[0]) if len(rows) else -1
+
+    def joined_counts(self, join: str, country: str = None) -> pd.DataFrame:
+        '''
+        joins the routes to their airlines or airports. the result is cached in joins, so the routes by destination
+        airport are joined once for every question grouping them
+
+        param join: 'airline' to join each route's airline, 'destination' to join its destination airport or 'hub' to join both of its airports
+        param country: when given only routes to this country are counted, or for 'hub' only airports in it
+        return: the rows of the airlines or airports table with at least one route, with their number of routes as their JOIN_AGGREGATES column
+        '''
+        if join == 'airline':
+            return self.joins.get(('routes', 'airlines', ('route_airline_id',), country),
+                                  lambda: joined_counts(self.airlines, self.counts.airline_routes(country)))
+        if join == 'hub':
+            return self.joins.get(('graph', 'airports', ('airport_id',), country),
+                                  lambda: joined_counts(self.airports, self.hub_degrees(country), 'degree'))
+        return self.joins.get(('routes', 'airports', ('route_to_airport_id',), country),
+                              lambda: joined_counts(self.airports, self.counts.destinations(country)))
+
+    def grouped_counts(self, join: str, keys: tuple, country: str = None) -> pd.DataFrame:
+        '''
+        groups the routes joined by joined_counts. the result is cached in joins
+
+        param join: 'airline', 'destination' or 'hub', as for joined_counts
+        param keys: the columns of the joined table to group by
+        param country: when given only routes to this country are counted, or for 'hub' only airports in it
+        return: a data frame of the groups, with their number of routes as their JOIN_AGGREGATES column
+        '''
+        return self.joins.get((join, 'groups', tuple(keys), country),
+                              lambda: group_counts(self.joined_counts(join, country), list(keys), JOIN_AGGREGATES[join][0]))
+
+
+class OutputWriter:
+    '''
+    writes the output files in the background while the next question is answered. csv files are written by a
+    thread, and charts are drawn by a pool of processes when there are several of them or by the thread otherwise
+    '''
+
+    def __init__(self, charts: int) -> None:
+        self.thread: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1)
+        self.processes: ProcessPoolExecutor = None
+        if charts > 0:
+            chart_figure()                          # imported once here rather than once in every worker
+        if charts > 1:
+            self.processes = ProcessPoolExecutor(max_workers=min(charts, os.cpu_count() or 1), initializer=tracemalloc.stop)   # --PROFILE_MEMORY only traces this process
+            self.processes.submit(int).result()     # forks every worker now, before the thread exists, so none is forked holding its locks
+        self.futures: list = []
+
+    def __enter__(self) -> 'OutputWriter':
+        return self
+
+    def __exit__(self, *error) -> None:
+        self.thread.shutdown()
+        if self.processes is not None:
+            self.processes.shutdown()
+
+    def write(self, path: str, text: str) -> None:
+        '''
+        writes a text file in the background
+
+        param path: string that specifies the file to write
+        param text: the whole text of the file
+        return: the file is written later thus returns nothing
+        '''
+        self.futures.append(self.thread.submit(write_text, path, text))
+
+    def render(self, *job) -> None:
+        '''
+        draws a chart in the background
+
+        param job: the arguments of render_chart
+        return: the chart is saved later thus returns nothing
+        '''
+        self.futures.append((self.processes or self.thread).submit(render_chart, *job))
+
+    def wait(self) -> None:
+        '''
+        waits for every file to be written, raising the first error of any of them
+
+        return: the files are written thus returns nothing
+        '''
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+
+def run_query(db: RouteDatabase, query: Query) -> pd.DataFrame:
+    '''
+    answers a query. queries joining routes to airlines or destination airports are answered from the route counts
+    the database already holds, queries joining both airports of each route from the routes themselves and queries
+    ranking hub airports from the route graph. distance queries rank the unique routes by distance, or their groups by
+    their longest route
+
+    param db: the database containing the airlines, airports and routes
+    param query: the query to answer
+    return: the final data frame, which answer_csv turns into the csv file and chart data
+    '''
+    by: list = [column for column, ascending in query.order]
+    ascending: list = [ascending for column, ascending in query.order]
+    if query.aggregate not in JOIN_AGGREGATES.get(query.join, ()):
+        raise ValueError(f"a {query.join} query cannot aggregate {query.aggregate}")
+
+    if query.join == 'route':
+        return top_unique_routes(db.route_pairs(query.country), query.limit, by, ascending)
+    if query.aggregate == 'distance':
+        return top_unique_routes(db.route_distances(query.country), query.limit, by, ascending)
+    if query.join == 'distance':
+        return top_rows(db.grouped_distances(query.keys, query.country), query.limit, by, ascending)
+    return top_rows(db.grouped_counts(query.join, query.keys, query.country), query.limit, by, ascending)
+
+
+def question_query(question: str, country: str = None, limit: int = None) -> Query:
+    '''
     param question: string the specifies what question this program has to answers
-    param graph_type: string the specifies what graph type the pdf file created should show
-    return: the program passes the final data frame to another function thus returns nothing
+    param country: when given, the country used instead of the question's own
+    param limit: when given, the number of rows used instead of the question's own
+    return: the query of the question, a KeyError is raised for a question that is not in QUERIES
     '''
-    airline_df.drop(['airline_country', 'airline_name', 'airline_icao_unique_code'], inplace=True, axis=1)
-    airports_df.drop(['airport_name', 'airport_city'], inplace=True, axis=1)
-    
-    airports_df = airports_df[airports_df['airport_country']=='Canada']
+    query: Query = QUERIES[question]
+    if country is not None and country != query.country:
+        query = query._replace(country=country, title=query.country_title or query.title)
+    if limit is not None:
+        query = query._replace(limit=limit)
+    return query
 
-    airports_df = airports_df.rename(columns = {'airport_id':'route_to_airport_id'})
-    answer: pd.DataFrame = routes_df.merge(airports_df, on='route_to_airport_id', how='inner')
-    answer = answer.rename(columns = {'airport_altitude':'to_airport_altitude', 'airport_icao_unique_code':'to_airport_icao_unique_code'})
 
-    airports_df = airports_df.rename(columns = {'route_to_airport_id': 'route_from_aiport_id'})
-    answer = answer.merge(airports_df, on='route_from_aiport_id', how='inner')
-    answer = answer.rename(columns = {'airport_altitude':'from_airport_altitude', 'airport_icao_unique_code':'from_airport_icao_unique_code'})
+def query_columns(queries: list) -> dict:
+    '''
+    finds the columns of each table that the queries read, so the others need not be loaded
 
-    answer['diff'] = -1.0               # creating a new column to store the difference and initializing it to -1 since the calculated difference >= 0
-    answer = column_diff(answer, 'to_airport_altitude', 'from_airport_altitude', 'diff')
-    answer = df_lstrip(answer,answer.columns)
-    answer = answer.sort_values(by=['diff', 'to_airport_icao_unique_code', 'from_airport_icao_unique_code'], ascending=[False, True, True]) 
-    process_data(answer, question, graph_type) 
+    param queries: the queries that will be answered
+    return: a dictionary of the columns of the airlines, airports and routes tables
+    '''
+    columns: dict = {'airlines': {'airline_id'}, 'airports': {'airport_id', 'airport_country'}, 'routes': set(ROUTE_COLUMNS)}
+    for query in queries:                       # RouteCounts always needs the ids and the country of every airport
+        if query.join == 'airline':
+            columns['airlines'].update(query.keys)
+        elif query.join in ('destination', 'hub'):
+            columns['airports'].update(query.keys)
+        elif query.join == 'distance':
+            columns['airports'].update(('airport_icao_unique_code',) + COORDINATE_COLUMNS)
+        else:
+            columns['airports'].update(ROUTE_PAIR_COLUMNS)
+    return {table: tuple(sorted(names)) for table, names in columns.items()}
 
-def clear_duplicates(df: pd.DataFrame) -> tuple:
+
+def top_rows(df: pd.DataFrame, n: int, by: list, ascending: list) -> pd.DataFrame:
     '''
-    stores unique routes from the data frame as a list of tuples
-    
-    param df: data frame containing information about the routes used in quesiton 5
+    finds the first n rows of the data frame in sorted order without sorting all of it. only the rows that can be in the
+    first n going by the first column are sorted, and the sort is stable so ties come out in the same order as a full sort
+
+    param df: the data frame to select from
+    param n: the number of rows wanted
+    param by: the columns to sort by, the first one must be numeric
+    param ascending: whether each column in by is sorted in ascending order
+    return: the first n rows of df sorted by the columns in by
+    '''
+    if ascending[0]:
+        first: pd.DataFrame = df.nsmallest(n, by[0], keep='all')          # keep='all' keeps every row tied with the nth one
+    else:
+        first: pd.DataFrame = df.nlargest(n, by[0], keep='all')
+    return first.sort_index().sort_values(by=by, ascending=ascending, kind='stable').head(n)
+
+
+def top_unique_routes(df: pd.DataFrame, n: int, by: list, ascending: list) -> pd.DataFrame:
+    '''
+    finds the first n unique routes in sorted order. the first rows are taken a few at a time and checked for
+    duplicates, and more rows are only taken when there are not yet n unique routes
+
+    param df: data frame containing information about the routes, like the one from RouteDatabase.route_pairs
+    param n: the number of unique routes wanted
+    param by: the columns to sort by, the first one must be numeric and is the value kept for each route
+    param ascending: whether each column in by is sorted in ascending order
+    return: a data frame of the unique routes with their from and to icao codes and their value of by[0]
+    '''
+    rows: int = n
+    while True:
+        uniques: list = clear_duplicates(top_rows(df, rows, by, ascending), n, by[0])
+        if len(uniques) == n or rows >= len(df):
+            return pd.DataFrame(uniques, columns=['from_airport_icao_unique_code', 'to_airport_icao_unique_code', by[0]])
+        rows *= 4
+
+
+def clear_duplicates(df: pd.DataFrame, limit: int = None, value: str = 'diff') -> list:
+    '''
+    stores unique routes from the data frame as a list of tuples, keeping the first time each route appears.
+    a route and its reverse count as the same route, so each one is remembered by the set of its two icao codes
+
+    param df: data frame containing information about the routes used in quesiton 5, already in the order wanted
+    param limit: the number of unique routes wanted, the scan stops once this many are found (None keeps all of them)
+    param value: the column kept with each route, which is part of what makes it unique
     return: a list of tuples containing only the unique routes from the data frame
     '''
-    uniques: tuple = []
-    for index, row in df.iterrows(): 
-        tmp1: tuple = (df.loc[index,'from_airport_icao_unique_code'], df.loc[index,'to_airport_icao_unique_code'], df.loc[index,'diff']) 
-        tmp2: tuple = (df.loc[index,'to_airport_icao_unique_code'], df.loc[index,'from_airport_icao_unique_code'], df.loc[index,'diff']) 
-        if tmp1 not in uniques and tmp2 not in uniques:
-            uniques.append(tmp1) 
-        
+    uniques: list = []
+    seen: set = set()
+    for route in zip(df['from_airport_icao_unique_code'], df['to_airport_icao_unique_code'], df[value]):
+        key: tuple = (frozenset(route[:2]), route[2])      # not sorted, since a missing code is nan, which cannot be compared with a string
+        if key not in seen:
+            seen.add(key)
+            uniques.append(route)
+            if len(uniques) == limit:
+                break
+
     return uniques
         
     
 def column_diff(df: pd.DataFrame, in1: str, in2: str, out: str) -> pd.DataFrame:
     '''
-    takes the difference between row values of two columns and stores it in the outpout column
+    takes the absolute difference between two numeric columns and stores it in the output column
 
     param df: the data frame that this function wants to modify
     param in1: string that spicifies the first column included in the calculation
@@ -164,144 +1128,716 @@ def column_diff(df: pd.DataFrame, in1: str, in2: str, out: str) -> pd.DataFrame:
     param out: string that specifies what column the resulting values should be stored in
     return: the updated data frame
     '''
-    uniques: tuple = []
-    for index, row in df.iterrows(): 
-        df.loc[index,out] = abs(float(row[in1]) - float(row[in2]))   
+    df[out] = (df[in1] - df[in2]).abs()
     return df
 
     
-def df_lstrip(df: pd.DataFrame, columns: str) -> pd.DataFrame: 
+def concatenated_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
     '''
-    strips the leading whitespace from all string entries in the data frame
-    
+    param starts: the first number of each range
+    param lengths: the length of each range
+    return: the numbers of every range one after the other, without a python loop over the ranges
+    '''
+    ends: np.ndarray = np.cumsum(lengths)
+    return np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + lengths, lengths)
+
+
+def great_circle_km(latitude1: np.ndarray, longitude1: np.ndarray, latitude2: np.ndarray, longitude2: np.ndarray) -> np.ndarray:
+    '''
+    finds the great circle distances between pairs of points with the haversine formula, all of them at once
+
+    param latitude1: the latitude of each first point in degrees
+    param longitude1: the longitude of each first point in degrees
+    param latitude2: the latitude of each second point in degrees
+    param longitude2: the longitude of each second point in degrees
+    return: the distance between each pair of points in km, nan where a coordinate is missing
+    '''
+    latitude1, longitude1, latitude2, longitude2 = (np.radians(angles) for angles in (latitude1, longitude1, latitude2, longitude2))
+    haversine: np.ndarray = (np.sin((latitude2 - latitude1) / 2) ** 2
+                             + np.cos(latitude1) * np.cos(latitude2) * np.sin((longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(haversine, 1.0)))
+
+
+def df_lstrip(df: pd.DataFrame) -> pd.DataFrame: 
+    '''
+    strips the leading whitespace from all string entries in the data frame, one whole column at a time
+
     param df: the data frame that this function wants to modify
-    param columns: a list of the column names in df
     return: the updated data frame 
     '''
-    for index, row in df.iterrows(): 
-        for column in columns:
-            if type(df.loc[index,column]) == str:
-                df.loc[index,column] = df.loc[index,column].lstrip()
+    for column in df.columns:
+        if pd.api.types.infer_dtype(df[column], skipna=True) in ('string', 'mixed'):
+            df[column] = df[column].str.lstrip().fillna(df[column])      # non-string entries come back as NaN, so they are restored
     return df
 
-def process_data(answer: pd.DataFrame, question: str, graph_type: str) -> None:
+
+def format_rows(df: pd.DataFrame, template: str) -> pd.Series:
     '''
-    takes information from the inputed data frame and creates a csv and pdf file based on the respective 
-    question and graph_type passed in the command line
+    fills in a format string such as "{airport_city}, {airport_country}" for every row of the data frame at once,
+    by joining whole columns of strings instead of formatting one row at a time
 
-    param answer: the final dataframe passed by question1-question5
-    param question: string the specifies what question this program has to answers
-    param graph_type: string the specifies what graph type the pdf file created should show
-    return: this function is the end of the program and thus returns nothing
+    param df: the data frame whose columns are named in the format string
+    param template: the format string
+    return: a series of the formatted string of each row
     '''
-    output_csv: file = open(f"{question}.csv",'w')
-    keys: str = []
-    values: int = [] 
-    
-    output_csv.write("subject,statistic\n")                     # writing to the csv file based on the question
-    for index, row in answer.iterrows():
-        if question == 'q1':
-            keys.append(row['airline_name'])
-            values.append(float(row['size']))
-            output_csv.write(f"{row['airline_name']} ({row['airline_icao_unique_code']}),{row['size']}\n")
-            
-        elif question == 'q2':
-            keys.append(row['airport_country'])
-            values.append(float(row['size']))
-            output_csv.write(f"{row['airport_country']},{row['size']}\n")
-
-        elif question == 'q3':
-            keys.append(f"{row['airport_name']} ({row['airport_icao_unique_code']})")
-            values.append(float(row['size']))
-            output_csv.write(f"\"{row['airport_name']} ({row['airport_icao_unique_code']}), {row['airport_city']}, {row['airport_country']}\",{row['size']}\n")
-
-        elif question == 'q4':
-            keys.append(f"{row['airport_city']}, {row['airport_country']}")
-            values.append(float(row['size']))
-            output_csv.write(f"\"{row['airport_city']}, {row['airport_country']}\",{row['size']}\n")
-
-    if question == 'q5':                                      
-        uniques = clear_duplicates(answer)                  # q5 is implemented differently than q1-q4 so it has its on individual case
-        for i in range(10):
-            keys.append(f"{uniques[i][0]}-{uniques[i][1]}")
-            values.append(uniques[i][2])
-            output_csv.write(f"{uniques[i][0]}-{uniques[i][1]},{uniques[i][2]}\n")
-            
-    f = plt.figure(figsize=(10,7))                          # creating the pie or bar chart based on the graph_type and saving it as a pdf file
-    if graph_type == 'bar':
-        plt.bar(keys, values)
-        plt.tick_params(axis='x', which='major', labelsize=8)
-        plt.xticks(rotation=60)
-        plt.subplots_adjust(top=0.9, bottom=0.3)
+    text: pd.Series = pd.Series('', index=df.index, dtype=object)
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        text = text + literal
+        if field is None:
+            continue
+        if spec or conversion:                  # the same as str.format, only slower, for the rare field that needs it
+            text = text + df[field].map(('{' + (f"!{conversion}" if conversion else '') + f":{spec}" + '}').format)
+        else:
+            text = text + df[field].astype(str)
+    return text
 
-    else:
-        plt.pie(values, labels=keys, autopct='%1.0f%%', labeldistance=1.2, pctdistance=0.7)
-        plt.subplots_adjust(left=0.1)
-
-    if question == 'q1':
-        plt.title("Top 20 Airlines With The Greatest Number Of Routes To Canada")
-        if graph_type == 'bar':
-            plt.xlabel("Airlines")
-            plt.ylabel("Frequency")
-
-    elif question == 'q2':
-        plt.title("Top 30 Countries With The Least Appearances As A Destination Country")
-        if graph_type == 'bar':
-            plt.xlabel("Countries")
-            plt.ylabel("Frequency")
-
-    elif question == 'q3':
-        plt.title("Top 10 Destination Airports")
-        if graph_type == 'bar':
-            plt.xlabel("Airports")
-            plt.ylabel("Frequency")
-        
-    elif question == 'q4':
-        plt.title("Top 15 Destination Cities")
-        if graph_type == 'bar':
-            plt.xlabel("Cities")
-            plt.ylabel("Frequency")
-        
-    else:
-        plt.title("Top 10 Canadian Routes With The Greatest Difference In Altitude")
-        if graph_type == 'bar':
-            plt.xlabel("Routes")
-            plt.ylabel("Difference In Altitude")
-        
-    f.savefig(f"{question}.pdf")
-    output_csv.close()
 
-    
-def main():
-    airline: str = sys.argv[1].split('=')[1]                # extracting the command line arguments
-    airports: str = sys.argv[2].split('=')[1]        
-    routes: str = sys.argv[3].split('=')[1]
-    question: str = sys.argv[4].split('=')[1]
-    graph_type: str = sys.argv[5].split('=')[1]
-    
-    with open(airline) as f:                                                # creating dataframes for the respective files
-        airline_df: pd.DataFrame = pd.DataFrame(yaml.load(f)['airlines'])
+def answer_csv(answer: pd.DataFrame, query: Query) -> tuple:
+    '''
+    takes information from the inputed data frame and builds the text of the csv file based on the query's subject and label
 
-    with open(airports) as f:
-        airports_df: pd.DataFrame = pd.DataFrame(yaml.load(f)['airports'])
+    param answer: the final dataframe passed by run_query
+    param query: the query the answer is for
+    return: a tuple of the text of the csv file, the chart labels and the chart values
+    '''
+    statistics: pd.Series = answer[query.aggregate].astype(str)
+    text: str = "subject,statistic\n" + "".join(format_rows(answer, query.subject) + "," + statistics + "\n")
+    return text, format_rows(answer, query.label).tolist(), answer[query.aggregate].astype(float).tolist()
 
-    with open(routes) as f:
-        routes_df: pd.DataFrame = pd.DataFrame(yaml.load(f)['routes'])
-    
-    if question == 'q1':
-        question1(airline_df, airports_df, routes_df, question, graph_type)
 
-    elif question == 'q2':
-        question2(airline_df, airports_df, routes_df, question, graph_type)
+def write_text(path: str, text: str) -> str:
+    '''
+    param path: string that specifies the file to write
+    param text: the whole text of the file, written at once
+    return: the path of the written file
+    '''
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
 
-    elif question == 'q3':
-        question3(airline_df, airports_df, routes_df, question, graph_type)
 
-    elif question == 'q4':
-        question4(airports_df, routes_df, question, graph_type)
+def yaml_loader():
+    '''
+    return: libyaml's C loader, which is much faster than the pure python one, or the pure python one without libyaml
+    '''
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def chart_figure():
+    '''
+    imports matplotlib the first time a chart is drawn, choosing its non-interactive Agg backend so no gui backend
+    is ever loaded, even if pyplot is imported later
+
+    return: matplotlib's Figure class
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    return Figure
+
+
+def render_chart(keys: list, values: list, query: Query, graph_type: str, path) -> str:
+    '''
+    creates the pie or bar chart of one question and saves it as a pdf file. an explicit Figure is used instead
+    of pyplot, so nothing is left open afterwards and it is safe to run in a worker process
+
+    param keys: the labels of the bars or pie slices
+    param values: the sizes of the bars or pie slices
+    param query: the query the chart answers, which has the chart's title and axis labels
+    param graph_type: string the specifies what graph type the pdf file should show
+    param path: string that specifies where the pdf file is saved, or a binary file object to write the pdf to
+    return: the path of the saved pdf file
+    '''
+    f = chart_figure()(figsize=(10,7))
+    ax = f.add_subplot()
+    if not len(values):                             # a pie chart cannot be drawn without slices, so both types say so instead
+        ax.text(0.5, 0.5, "No routes answer this question", ha='center', va='center', transform=ax.transAxes)
+        ax.set_axis_off()
+
+    elif graph_type == 'bar':
+        ax.bar(keys, values)
+        ax.tick_params(axis='x', which='major', labelsize=8, labelrotation=60)
+        ax.set_xlabel(query.xlabel)
+        ax.set_ylabel(query.ylabel)
+        f.subplots_adjust(top=0.9, bottom=0.3)
 
     else:
-        question5(airline_df, airports_df, routes_df, question, graph_type)
+        ax.pie(values, labels=keys, autopct='%1.0f%%', labeldistance=1.2, pctdistance=0.7)
+        f.subplots_adjust(left=0.1)
+
+    ax.set_title(query.title.format(limit=query.limit, country=query.country))
+    f.savefig(path, format='pdf')
+    return path
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    strips the strings of a freshly parsed data frame and converts its columns to the types used by the questions
+
+    param df: the data frame that this function wants to modify
+    return: the data frame with stripped strings, the column types from COLUMN_TYPES and categorical CATEGORICAL_COLUMNS
+    '''
+    df = df_lstrip(df)
+    for column in df.columns.intersection(COLUMN_TYPES.keys()):
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype(COLUMN_TYPES[column])
+    for column in df.columns.intersection(CATEGORICAL_COLUMNS):
+        df[column] = df[column].astype('category')                  # the categories are sorted, so sorting by them stays alphabetical
+    return df
+
+
+def iter_table_chunks(path: str, table: str, chunk_size: int, columns: tuple = None, clean: bool = True):
+    '''
+    reads one table of a yaml file with yaml's event parser, one record at a time, so the whole document
+    is never held in memory. the table must be a list of mappings of scalars, like the routes table. this is also
+    much faster than yaml.load, which builds every record as python objects before any of them are used
+
+    param path: string that specifies the yaml file to read
+    param table: string that specifies the top level key of the yaml file holding the table
+    param chunk_size: the most rows yielded at once, None yields the whole table as one data frame
+    param columns: the columns to keep, the values of the others are skipped as they are read. None keeps every column
+    param clean: whether each data frame is cleaned with clean_frame, or left as the strings that were read
+    return: a generator of data frames of at most chunk_size rows
+    '''
+    records: list = []
+    record: dict = {}
+    anchors: dict = {}              # records and values marked with an &anchor, which a later *alias repeats
+    anchor: str = None              # the anchor of the record being read
+    key: str = None                 # the mapping key waiting for its value, at the top level or inside a record
+    depth: int = 0                  # 1 is the top level mapping, 2 the table's list and 3 one record
+    in_table: bool = False
+
+    with open(path) as f:
+        for event in yaml.parse(f, Loader=yaml_loader()):
+            if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                depth += 1
+                if depth == 2:
+                    in_table, key = key == table, None
+                elif depth == 3 and in_table:
+                    record, key, anchor = {}, None, event.anchor
+
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                depth -= 1
+                if depth == 2 and in_table:
+                    if anchor is not None:
+                        anchors[anchor] = record
+                    records.append(record)
+                elif depth == 1:
+                    in_table = False
+
+            elif isinstance(event, yaml.AliasEvent) and depth == 2 and in_table:
+                records.append(anchors[event.anchor])       # yaml.dump writes a record that appears twice as an alias
+
+            elif isinstance(event, (yaml.ScalarEvent, yaml.AliasEvent)) and (depth == 1 or (depth == 3 and in_table)):
+                if isinstance(event, yaml.ScalarEvent) and event.anchor is not None:
+                    anchors[event.anchor] = event.value
+                value: str = anchors.get(event.anchor) if isinstance(event, yaml.AliasEvent) else event.value
+                if key is None:
+                    key = value
+                else:
+                    if depth == 3 and (columns is None or key in columns):
+                        record[key] = value
+                    key = None
+
+            if len(records) == chunk_size:
+                yield clean_frame(pd.DataFrame(records)) if clean else pd.DataFrame(records)
+                records = []
+
+    if records:
+        yield clean_frame(pd.DataFrame(records)) if clean else pd.DataFrame(records)
+
+
+def add_keys(totals: pd.Series, keys: np.ndarray, sign: int) -> pd.Series:
+    '''
+    counts how many times each key appears and adds that to the totals
+
+    param totals: a series of counts indexed by key
+    param keys: the keys to count, repeated keys are counted more than once
+    param sign: 1 to add the counts, -1 to take them away
+    return: the new totals, without the keys whose total is 0
+    '''
+    values, counts = np.unique(keys, return_counts=True)
+    totals = totals.add(pd.Series(sign * counts, index=values), fill_value=0).astype(np.int64)
+    return totals[totals != 0]
+
+
+def joined_counts(df: pd.DataFrame, counts: np.ndarray, column: str = 'size') -> pd.DataFrame:
+    '''
+    param df: the airlines or airports table
+    param counts: the count of each row of df
+    param column: the name of the column the counts are put in
+    return: the rows of df with a count above 0, with their count as column
+    '''
+    df = df.assign(**{column: counts})
+    return df[df[column] > 0]
+
+
+def group_counts(df: pd.DataFrame, keys: list, column: str = 'size') -> pd.DataFrame:
+    '''
+    adds up per row counts over groups of rows
+
+    param df: the rows of the airlines or airports table with their count as column, like the one from joined_counts
+    param keys: the columns of df to group by
+    param column: the column of df holding the counts
+    return: a data frame of the groups, with the total count as column
+    '''
+    return df.groupby(keys, as_index=False, observed=True)[column].sum()
+
+
+def load_table(path: str, table: str, columns: tuple = None) -> pd.DataFrame:
+    '''
+    creates a cleaned data frame from one table of a yaml file. the cleaned data frame is pickled next to the
+    yaml file and reused on later runs for as long as the yaml file keeps the same modification time and size,
+    and as long as it has every column asked for
+
+    param path: string that specifies the yaml file to load
+    param table: string that specifies the top level key of the yaml file holding the table
+    param columns: the columns to load, the others are not parsed or kept. None loads every column
+    return: the cleaned data frame
+    '''
+    with profiler.stage(f"load {table}", columns_in=len(columns) if columns else 'all') as record:
+        if os.path.isdir(path):                 # a directory from convert.py is memory mapped, which is faster than any cache
+            df: pd.DataFrame = load_columns(path, table, columns)
+            record['cache'], record['rows_out'] = 'columns', len(df)
+            return df
+
+        df, record['cache'] = load_cached(path, table, lambda wanted: parse_table(path, table, wanted), columns)
+        record['rows_out'] = len(df)
+        return project(df, columns)
+
+
+def parse_table(path: str, table: str, columns: tuple = None) -> pd.DataFrame:
+    '''
+    param path: string that specifies the yaml file to parse
+    param table: string that specifies the top level key of the yaml file holding the table
+    param columns: the columns to keep, None keeps every column
+    return: the cleaned data frame
+    '''
+    with profiler.stage(f"parse {table}") as record:
+        df: pd.DataFrame = next(iter_table_chunks(path, table, None, columns, clean=False), None)
+        if df is None:
+            df = pd.DataFrame(columns=list(columns or ()))
+        record['rows_out'] = len(df)
+    with profiler.stage(f"clean {table}", rows_in=len(df)):     # stripping the strings and converting the columns
+        return clean_frame(df)
+
+
+def project(df: pd.DataFrame, columns: tuple = None) -> pd.DataFrame:
+    '''
+    param df: the data frame to select columns from
+    param columns: the columns to keep, None keeps every column
+    return: the data frame with only the columns asked for, in the order they are in df
+    '''
+    if columns is None:
+        return df
+    return df[[column for column in df.columns if column in columns]]
+
+
+def load_combined(path: str, columns: dict = None) -> tuple:
+    '''
+    creates the airlines, airports and routes tables from one combined yaml document, where each route names its airline
+    and both of its airports instead of giving their ids. the document is read in one streaming pass and the tables are
+    cached like those of load_table
+
+    param path: string that specifies the combined yaml file
+    param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+    return: a tuple of the cleaned airlines, airports and routes data frames
+    '''
+    keys: tuple = None                          # the keys of each route in the document that are read
+    if columns is not None:
+        keys = (*(column for column in AIRLINE_COLUMNS if column in columns['airlines']),
+                *(f"{end}_{column}" for end in ('from', 'to') for column in AIRPORT_COLUMNS + COORDINATE_COLUMNS if column in columns['airports']))
+
+    with profiler.stage('load combined', columns_in=len(keys) if keys else 'all') as record:
+        tables, record['cache'] = load_cached(path, 'combined', lambda wanted: split_combined(path, wanted), keys)
+        if keys is not None:
+            tables = tuple(project(df, columns[table]) for df, table in zip(tables, ('airlines', 'airports', 'routes')))
+        record['airlines_out'], record['airports_out'], record['routes_out'] = (len(df) for df in tables)
+        return tables
+
+
+def split_combined(path: str, keys: tuple = None) -> tuple:
+    '''
+    parses a combined yaml document and splits its routes into the airlines, airports and routes tables. every distinct
+    airline and airport is given an id, and an airport is the same wherever it is the origin or the destination of a route.
+    when only some keys are read, airports that differ only in the keys that are not read become one airport, which
+    does not change any answer grouped by the keys that are read
+
+    param path: string that specifies the combined yaml file
+    param keys: the keys of each route to read, such as airline_name or from_airport_city. None reads every key
+    return: a tuple of the cleaned airlines, airports and routes data frames
+    '''
+    airline_columns: list = [column for column in AIRLINE_COLUMNS if keys is None or column in keys]
+    airport_columns: list = [column for column in AIRPORT_COLUMNS + COORDINATE_COLUMNS if keys is None or f"from_{column}" in keys]
+    combined: pd.DataFrame = parse_table(path, 'routes', keys)
+    if combined is None or combined.empty:
+        combined = pd.DataFrame(columns=[*airline_columns, *(f"{end}_{column}" for end in ('from', 'to') for column in airport_columns)])
+    airport_columns = [column for column in airport_columns                    # the coordinates are only kept when the document has them
+                       if column not in COORDINATE_COLUMNS or all(f"{end}_{column}" in combined.columns for end in ('from', 'to'))]
+
+    airlines: pd.DataFrame = combined[airline_columns]
+    airline_ids: np.ndarray = np.zeros(len(combined), dtype=np.int64)
+    if airline_columns:                         # with no airline columns read every route has the same airline
+        airline_ids = airlines.groupby(airline_columns, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    ends: list = [combined[[f"{end}_{column}" for column in airport_columns]].set_axis(airport_columns, axis=1) for end in ('from', 'to')]
+    airports: pd.DataFrame = pd.concat(ends, ignore_index=True)
+    airport_ids: np.ndarray = airports.groupby(airport_columns, sort=False, dropna=False).ngroup().to_numpy()
+
+    airlines = airlines.assign(airline_id=airline_ids).drop_duplicates('airline_id')
+    airports = airports.assign(airport_id=airport_ids).drop_duplicates('airport_id')
+    routes: pd.DataFrame = pd.DataFrame({'route_airline_id': airline_ids,
+                                         'route_from_aiport_id': airport_ids[:len(combined)],
+                                         'route_to_airport_id': airport_ids[len(combined):]})
+    return (clean_frame(airlines[['airline_id', *airline_columns]].reset_index(drop=True)),
+            clean_frame(airports[['airport_id', *airport_columns]].reset_index(drop=True)),
+            clean_frame(routes))
+
+
+def load_cached(path: str, name: str, build, columns: tuple = None) -> tuple:
+    '''
+    builds something from a yaml file, or reuses what was built on an earlier run. it is pickled next to the yaml file
+    and reused for as long as the yaml file keeps the same modification time and size, and was built from at least
+    the columns asked for. when it was built from other columns it is built again from both, so runs asking for
+    different columns widen the cache instead of replacing it
+
+    param path: string that specifies the yaml file
+    param name: string that specifies what is built from the yaml file, such as the table
+    param build: a function that builds it from the yaml file, given the columns of the yaml file to read or None for every column
+    param columns: the columns of the yaml file that are asked for, None for every column
+    return: a tuple of what was built, which may have more columns than asked for, and 'hit' or 'miss' for whether it came from the cache
+    '''
+    key: tuple = (CACHE_VERSION, name, *file_key(path))
+    cache: str = f"{path}{CACHE_SUFFIX}"
+
+    try:
+        with open(cache, 'rb') as f:
+            cached: dict = pickle.load(f)
+        if cached['key'] == key and (cached['columns'] is None or (columns is not None and set(columns) <= set(cached['columns']))):
+            return cached['frame'], 'hit'
+        if cached['key'] == key and columns is not None:
+            columns = tuple(sorted(set(columns) | set(cached['columns'])))
+    except Exception:                           # a missing, stale or unreadable cache just means parsing the yaml again
+        pass
+
+    built = build(columns)
+    try:
+        write_pickle(cache, {'key': key, 'columns': columns, 'frame': built})
+    except OSError:                             # the cache is only an optimization, so a read only directory is fine
+        pass
+    return built, 'miss'
+
+
+def table_columns(path: str, table: str) -> set:
+    '''
+    finds the columns of a table from its first record, without reading the rest of the file
+
+    param path: string that specifies the yaml file, or a directory written by write_columns
+    param table: string that specifies the top level key of the yaml file holding the table
+    return: a set of the names of the columns, empty when the table has no records
+    '''
+    if os.path.isdir(path):
+        with open(os.path.join(path, COLUMNS_META)) as f:
+            return {column['name'] for column in json.load(f)['columns']}
+    for chunk in iter_table_chunks(path, table, 1):
+        return set(chunk.columns)
+    return set()
+
+
+def write_columns(df: pd.DataFrame, directory: str, table: str) -> None:
+    '''
+    writes a cleaned data frame to a directory in a columnar layout that load_columns can memory map. every column is
+    a .npy file: ids are int64 with NULL_ID for a missing id, floats are float64, and strings are dictionary encoded
+    as integer codes into a list of the distinct strings, which is kept in the COLUMNS_META file with the column types.
+    the directory is written under a temporary name first so other runs never read half of it
+
+    param df: the cleaned data frame, like the one from load_table
+    param directory: string that specifies the directory to write, it is replaced if it exists
+    param table: string that specifies the name of the table, which load_columns checks
+    return: the directory is written thus returns nothing
+    '''
+    temporary: str = f"{directory}.{os.getpid()}"
+    os.makedirs(temporary)
+    columns: list = []
+    for column in df.columns:
+        series: pd.Series = df[column]
+        if isinstance(series.dtype, pd.Int64Dtype):
+            np.save(os.path.join(temporary, f"{column}.npy"), series.to_numpy(dtype=np.int64, na_value=NULL_ID))
+            columns.append({'name': column, 'kind': 'id'})
+        elif pd.api.types.is_float_dtype(series.dtype):
+            np.save(os.path.join(temporary, f"{column}.npy"), series.to_numpy(dtype=np.float64))
+            columns.append({'name': column, 'kind': 'float'})
+        else:                                   # categories keep their own dictionary, other strings get one from factorize
+            categorical: bool = isinstance(series.dtype, pd.CategoricalDtype)
+            if categorical:
+                codes, dictionary = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                codes, dictionary = pd.factorize(series)
+            np.save(os.path.join(temporary, f"{column}.npy"), codes)
+            columns.append({'name': column, 'kind': 'category' if categorical else 'string', 'dtype': str(series.dtype),
+                            'dictionary': [str(value) for value in dictionary]})
+
+    with open(os.path.join(temporary, COLUMNS_META), 'w') as f:
+        json.dump({'version': COLUMNS_VERSION, 'table': table, 'rows': len(df), 'columns': columns}, f)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.replace(temporary, directory)
+
+
+def load_columns(directory: str, table: str, columns: tuple = None) -> pd.DataFrame:
+    '''
+    reads a table written by write_columns. the .npy files are memory mapped, so ids, floats and the codes of
+    categories are read straight from the page cache, which concurrent runs share, instead of being parsed. only
+    the dictionaries and the strings of columns that are not categorical are built in memory
+
+    param directory: string that specifies the directory written by write_columns
+    param table: string that specifies the table the directory should hold
+    param columns: the columns to read, the files of the others are not opened. None reads every column
+    return: the cleaned data frame, the same as load_table returns for the yaml file it was converted from
+    '''
+    with open(os.path.join(directory, COLUMNS_META)) as f:
+        meta: dict = json.load(f)
+    if meta['version'] != COLUMNS_VERSION or meta['table'] != table:
+        raise ValueError(f"{directory} does not hold the {table} table in version {COLUMNS_VERSION} of the columnar layout, convert it again")
+
+    data: dict = {}
+    for column in meta['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        values: np.ndarray = np.load(os.path.join(directory, f"{column['name']}.npy"), mmap_mode='r')
+        if column['kind'] == 'id':
+            data[column['name']] = pd.arrays.IntegerArray(values, values == NULL_ID)
+        elif column['kind'] == 'float':
+            data[column['name']] = values
+        else:
+            categories: pd.Categorical = pd.Categorical.from_codes(values, pd.Index(column['dictionary'], dtype=str))
+            data[column['name']] = categories if column['kind'] == 'category' else categories.astype(column['dtype'])
+    return pd.DataFrame(data, copy=False)
+
+
+def file_key(path: str) -> tuple:
+    '''
+    param path: string that specifies a file, or a directory written by write_columns
+    return: a tuple of the file's modification time and size, which changes whenever the file does
+    '''
+    if os.path.isdir(path):
+        path = os.path.join(path, COLUMNS_META)
+    stat: os.stat_result = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def state_key(airline: str, airports: str, routes: str) -> tuple:
+    '''
+    param airline: string that specifies the airlines yaml file
+    param airports: string that specifies the airports yaml file
+    param routes: string that specifies the routes yaml file the counts were first counted from
+    return: the key that saved route counts must match to be used with these files
+    '''
+    return (STATE_VERSION, *file_key(airline), *file_key(airports), *file_key(routes))
+
+
+def delta_key(path: str, sign: int) -> tuple:
+    '''
+    param path: string that specifies a yaml file of routes added to or removed from the counts
+    param sign: 1 when the routes are added, -1 when they are removed
+    return: the key saved with the counts for each update, which only matches the same file applied the same way again
+    '''
+    return (sign, os.path.abspath(path), *file_key(path))
+
+
+def write_pickle(path: str, data) -> None:
+    '''
+    pickles data to a file. it is written under a temporary name first so other runs never read half a file
+
+    param path: string that specifies the file
+    param data: the object to pickle
+    return: the file is written thus returns nothing
+    '''
+    with open(f"{path}.{os.getpid()}", 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.{os.getpid()}", path)
+
+
+def parse_questions(argument: str) -> list:
+    '''
+    turns the --QUESTION argument into the list of questions to answer
+
+    param argument: a single question such as "q1", a comma separated list such as "q1,q3,q5", or "all" for ALL_QUESTIONS
+    return: a list of the questions in the order they should be answered
+    '''
+    if argument == 'all':
+        return list(ALL_QUESTIONS)
+    questions: list = [question.strip() for question in argument.split(',')]
+    unknown: list = [question for question in questions if question not in QUESTIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown question {', '.join(unknown)}, choose from {', '.join(QUESTIONS)} or all")
+    return questions
+
+
+def parse_graph_types(argument: str) -> list:
+    '''
+    turns the --GRAPH_TYPE argument into the list of graph types to draw
+
+    param argument: a single graph type such as "bar", or a comma separated list such as "bar,pie"
+    return: a list of the graph types
+    '''
+    graph_types: list = [graph_type.strip() for graph_type in argument.split(',')]
+    unknown: list = [graph_type for graph_type in graph_types if graph_type not in GRAPH_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown graph type {', '.join(unknown)}, choose from {', '.join(GRAPH_TYPES)}")
+    return graph_types
+
+
+def whole_number(argument: str) -> int:
+    '''
+    param argument: an argument that must be a whole number, such as --LIMIT
+    return: the number
+    '''
+    if not argument.isdigit():
+        raise argparse.ArgumentTypeError(f"{argument} is not a whole number")
+    return int(argument)
+
+
+def existing_path(argument: str) -> str:
+    '''
+    param argument: the path given to one of the input file arguments
+    return: the path, an argparse.ArgumentTypeError is raised when nothing is there
+    '''
+    if not os.path.exists(argument):
+        raise argparse.ArgumentTypeError(f"{argument} does not exist")
+    return argument
+
+
+def add_table_arguments(parser: argparse.ArgumentParser) -> None:
+    '''
+    adds the arguments naming the files the tables are read from, which route_server.py reads the same way
+
+    param parser: the parser to add them to
+    return: the arguments are added thus returns nothing
+    '''
+    parser.add_argument('--AIRLINES', dest='airlines', type=existing_path, help="the airlines yaml file, or a directory from convert.py")
+    parser.add_argument('--AIRPORTS', dest='airports', type=existing_path, help="the airports yaml file, or a directory from convert.py")
+    parser.add_argument('--ROUTES', dest='routes', type=existing_path, help="the routes yaml file, or a directory from convert.py")
+    parser.add_argument('--DATA', dest='data', type=existing_path, help="one combined yaml document instead of the three files")
+
+
+def check_table_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    '''
+    checks that the tables are read either from the three files or from one combined document
+
+    param parser: the parser the arguments came from, which reports the error and exits
+    param args: the parsed arguments
+    return: the arguments are checked thus returns nothing
+    '''
+    if args.data is not None:
+        if args.airlines or args.airports or args.routes:
+            parser.error("--DATA replaces --AIRLINES, --AIRPORTS and --ROUTES")
+    elif not (args.airlines and args.airports and args.routes):
+        parser.error("either --AIRLINES, --AIRPORTS and --ROUTES or --DATA is required")
+
+
+def parse_arguments(argv: list) -> argparse.Namespace:
+    '''
+    reads the command line arguments, which can be given in any order. the questions and graph types are checked here,
+    before any file is read or pandas is imported, so a bad run fails straight away. the distance questions also read
+    the first airport to check that the airports have coordinates
+
+    param argv: the command line arguments, without the program name
+    return: the arguments, named after their flags in lower case
+    '''
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="answers questions about airline routes as csv files and pdf charts")
+    add_table_arguments(parser)
+    parser.add_argument('--QUESTION', dest='questions', metavar='QUESTION', type=parse_questions, required=True, help=f"{', '.join(QUESTIONS)}, several separated by commas, or all for {', '.join(ALL_QUESTIONS)}")
+    parser.add_argument('--GRAPH_TYPE', dest='graph_types', metavar='GRAPH_TYPE', type=parse_graph_types, required=True, help=f"{', '.join(GRAPH_TYPES)}, or several separated by commas")
+    parser.add_argument('--COUNTRY', dest='country', help="the country used instead of each question's own")
+    parser.add_argument('--LIMIT', dest='limit', type=whole_number, help="the number of rows used instead of each question's own")
+    parser.add_argument('--CHUNK_SIZE', dest='chunk_size', type=whole_number, help="streams the routes this many at a time")
+    parser.add_argument('--STATE', dest='state', help="the file the route counts are saved to and restored from")
+    parser.add_argument('--ADDED_ROUTES', dest='added_routes', type=existing_path, help="a yaml file of routes to add to the saved route counts")
+    parser.add_argument('--REMOVED_ROUTES', dest='removed_routes', type=existing_path, help="a yaml file of routes to remove from the saved route counts")
+    parser.add_argument('--PROFILE', dest='profile', help="the json file the timings of each stage are written to")
+    parser.add_argument('--PROFILE_MEMORY', dest='profile_memory', action='store_true', help="also traces the peak memory python allocates in each stage, which is several times slower")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    check_table_arguments(parser, args)
+    if args.data is not None and (args.chunk_size or args.state or args.added_routes or args.removed_routes):
+        parser.error("--CHUNK_SIZE, --STATE, --ADDED_ROUTES and --REMOVED_ROUTES need --AIRLINES, --AIRPORTS and --ROUTES instead of --DATA")
+    if args.chunk_size == 0:
+        parser.error("--CHUNK_SIZE must be at least 1")
+    if args.limit == 0:
+        parser.error("--LIMIT must be at least 1")
+    if args.profile_memory and args.profile is None:
+        parser.error("--PROFILE_MEMORY needs --PROFILE")
+
+    distances: list = [question for question in args.questions if QUERIES[question].join == 'distance']
+    if distances:                                           # only the first airport is read, so this fails before loading anything
+        if args.data is not None:                           # each route of a combined document names its airports' columns from_ and to_
+            found: set = {name[len('from_'):] for name in table_columns(args.data, 'routes') if name.startswith('from_')}
+        else:
+            found: set = table_columns(args.airports, 'airports')
+        if not set(COORDINATE_COLUMNS) <= found:
+            parser.error(f"the airports must have {' and '.join(COORDINATE_COLUMNS)} columns to answer {', '.join(distances)}, "
+                         f"and those in {args.data or args.airports} do not")
+    return args
+
+
+def load_database(args: argparse.Namespace, columns: dict = None) -> RouteDatabase:
+    '''
+    creates the database from the three files, from saved route counts or by streaming the routes, as the arguments say
+
+    param args: the command line arguments from parse_arguments
+    param columns: the columns of each table to load, like the dictionary from query_columns. None loads every column
+    return: the loaded database
+    '''
+    db: RouteDatabase = None
+    if args.state is not None:                                              # saved counts replace the routes file when they still match
+        db = RouteDatabase.restore(args.airlines, args.airports, args.routes, args.state, columns)
+    if db is None and args.chunk_size is not None:                          # streaming keeps only the counts of the routes
+        db = RouteDatabase.stream(args.airlines, args.airports, args.routes, args.chunk_size, columns)
+    elif db is None:
+        db = RouteDatabase.load(args.airlines, args.airports, args.routes, columns)     # loading the respective files into one database
+    if args.added_routes is not None or args.removed_routes is not None:
+        db.update(args.added_routes, args.removed_routes)
+    if args.state is not None:
+        db.save(args.airlines, args.airports, args.routes, args.state)
+    return db
+
+
+def main():
+    args: argparse.Namespace = parse_arguments(sys.argv[1:])                # exits here on a bad argument, before anything is read
+    questions: list = args.questions
+    graph_types: list = args.graph_types
+    if args.profile is not None:
+        profiler.enable(args.profile_memory)
+        with profiler.stage('import'):                                      # pandas is imported lazily, so its import is timed here instead of in the first load
+            pd.DataFrame, np.ndarray, yaml.parse
+    queries: dict = {question: question_query(question, args.country, args.limit) for question in questions}
+    columns: dict = query_columns(list(queries.values()))                  # only the columns the questions read are loaded
+
+    try:
+        if args.data is not None:                                           # one combined document instead of the three files
+            db: RouteDatabase = RouteDatabase.load_combined(args.data, columns)
+        else:
+            db: RouteDatabase = load_database(args, columns)
+        db.check_country(args.country)                                      # before any file is written, since nothing would be in them
+    except ValueError as error:                                             # such as an id on more than one row of a table
+        sys.exit(f"{os.path.basename(sys.argv[0])}: error: {error}")
+
+    with OutputWriter(len(queries) * len(graph_types)) as output:           # files are written while the next question is answered
+        for question, query in queries.items():                             # every question reuses the same database
+            with profiler.stage(f"answer {question}") as record:
+                answer: pd.DataFrame = run_query(db, query)
+                record['rows_out'] = len(answer)
+            with profiler.stage(f"csv {question}", rows_in=len(answer)):
+                text, keys, values = answer_csv(answer, query)
+            output.write(f"{question}.csv", text)
+            for graph_type in graph_types:                                  # with several graph types each pdf file is named after its type
+                path: str = f"{question}.pdf" if len(graph_types) == 1 else f"{question}_{graph_type}.pdf"
+                output.render(keys, values, query, graph_type, path)
+
+        with profiler.stage('output', charts=len(queries) * len(graph_types)):   # cpu time and memory of the workers are not included
+            output.wait()
+
+    if profiler.enabled:
+        profiler.write(args.profile)
         
 
 if __name__ == '__main__':
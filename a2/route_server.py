@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Loads the airlines, airports and routes once and answers the questions of route_manager.py over http
+Sample input: --AIRLINES="airlines.yaml" --AIRPORTS="airports.yaml" --ROUTES="routes.yaml" --PORT="8265"
+or with one combined document: --DATA="../a3/routes-airlines-airports.yaml" --PORT="8265"
+Sample requests:
+    GET /                               the questions that can be asked, as json
+    GET /q1                             the csv file of q1
+    GET /q3?format=json                 the answer of q3 as a list of json objects
+    GET /q5?format=pdf&graph=pie        the pie chart of q5 as a pdf file
+    GET /q1?country=France&limit=5      q1 asked about France instead of Canada, with 5 rows instead of 20
+    GET /path?from=CYYZ&to=YSSY         the airports of a connection with the fewest hops between two airports, by icao code or id
+    GET /reachable?from=CYYZ&hops=2     the airports reachable from an airport, in at most 2 hops when hops is given
+    GET /within?lat=49.2&lon=-123.2&radius=100      the airports within 100 km of a point, nearest first
+    GET /nearest?lat=49.2&lon=-123.2&k=5            the 5 airports nearest to a point
+the last two need airport_latitude and airport_longitude columns in the airports file
+@author: doyeniyi
+"""
+import io
+import os
+import sys
+import argparse
+import json
+import math
+import urllib.parse
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import route_manager
+
+FORMATS: dict = {'csv': 'text/csv', 'json': 'application/json', 'pdf': 'application/pdf'}     # the content type of each format
+GRAPH_REQUESTS: tuple = ('path', 'reachable')                                                 # requests answered from the route graph
+SPATIAL_REQUESTS: tuple = ('within', 'nearest')                                               # requests answered from the airport index
+AIRPORT_COLUMNS: tuple = ('airport_name', 'airport_icao_unique_code', 'airport_city', 'airport_country')    # the columns sent for each airport
+
+
+class RouteServer(ThreadingHTTPServer):
+    '''
+    an http server that answers every request, each on its own thread, from the same database
+    '''
+    daemon_threads: bool = True
+
+    def __init__(self, address: tuple, db: route_manager.RouteDatabase) -> None:
+        super().__init__(address, RouteRequestHandler)
+        self.db: route_manager.RouteDatabase = db
+
+
+class RouteRequestHandler(BaseHTTPRequestHandler):
+    '''
+    answers GET requests for the questions of route_manager.py
+    '''
+
+    def do_GET(self) -> None:
+        url: urllib.parse.SplitResult = urllib.parse.urlsplit(self.path)
+        params: dict = dict(urllib.parse.parse_qsl(url.query))
+        question: str = url.path.strip('/')
+
+        if question == '':
+            self.send_body(json.dumps({'questions': list(route_manager.QUESTIONS), 'formats': list(FORMATS),
+                                       'graph_types': list(route_manager.GRAPH_TYPES), 'graph': list(GRAPH_REQUESTS),
+                                       'spatial': list(SPATIAL_REQUESTS)}).encode(), FORMATS['json'])
+            return
+        if question in GRAPH_REQUESTS:
+            self.send_graph(question, params)
+            return
+        if question in SPATIAL_REQUESTS:
+            self.send_spatial(question, params)
+            return
+
+        output_format: str = params.get('format', 'csv')
+        graph_type: str = params.get('graph', 'bar')
+        limit: str = params.get('limit')
+        if question not in route_manager.QUESTIONS:
+            self.send_error(404, f"unknown question {question}")
+        elif output_format not in FORMATS or graph_type not in route_manager.GRAPH_TYPES:
+            self.send_error(400, f"format must be one of {', '.join(FORMATS)} and graph one of {', '.join(route_manager.GRAPH_TYPES)}")
+        elif limit is not None and not (limit.isdigit() and int(limit) > 0):
+            self.send_error(400, "limit must be a whole number of at least 1")
+        else:
+            query: route_manager.Query = route_manager.question_query(question, params.get('country'), None if limit is None else int(limit))
+            try:
+                self.server.db.check_country(params.get('country'))
+                body: bytes = answer_body(self.server.db, query, output_format, graph_type)
+            except ValueError as error:                                       # such as an unknown country or a distance question without coordinates
+                self.send_error(400, str(error))
+                return
+            self.send_body(body, FORMATS[output_format])
+
+    def send_graph(self, request: str, params: dict) -> None:
+        '''
+        answers a path or reachable request from the route graph of the database
+
+        param request: 'path' or 'reachable'
+        param params: the parameters of the request
+        return: the response is sent thus returns nothing
+        '''
+        db: route_manager.RouteDatabase = self.server.db
+        hops: str = params.get('hops')
+        source: int = db.airport_row(params.get('from', ''))
+        target: int = db.airport_row(params.get('to', '')) if request == 'path' else 0
+        if source < 0 or target < 0:
+            self.send_error(404, "from and, for path, to must be the icao code or id of an airport")
+        elif hops is not None and not hops.isdigit():
+            self.send_error(400, "hops must be a whole number")
+        elif request == 'path':
+            rows: list = db.graph().path(source, target)
+            answer: dict = {'hops': None if rows is None else len(rows) - 1, 'airports': airport_records(db, rows or [])}
+            self.send_body(json.dumps(answer).encode(), FORMATS['json'])
+        else:
+            reached: np.ndarray = db.graph().reachable(source, None if hops is None else int(hops))
+            rows: list = np.flatnonzero(reached > 0).tolist()
+            answer: dict = {'airports': airport_records(db, rows, hops=reached[rows].tolist())}
+            self.send_body(json.dumps(answer).encode(), FORMATS['json'])
+
+    def send_spatial(self, request: str, params: dict) -> None:
+        '''
+        answers a within or nearest request from the airport index of the database
+
+        param request: 'within' or 'nearest'
+        param params: the parameters of the request
+        return: the response is sent thus returns nothing
+        '''
+        try:
+            latitude, longitude = float(params['lat']), float(params['lon'])
+            size: float = float(params['radius']) if request == 'within' else int(params['k'])
+        except (KeyError, ValueError):
+            self.send_error(400, "lat, lon and radius in km for within or k for nearest must be numbers")
+            return
+        if not (all(math.isfinite(number) for number in (latitude, longitude, size))
+                and -90 <= latitude <= 90 and -180 <= longitude <= 180 and size >= 0):
+            self.send_error(400, "lat must be between -90 and 90, lon between -180 and 180, and radius or k a finite number that is not negative")
+            return
+
+        try:
+            index: route_manager.AirportIndex = self.server.db.airport_index()
+        except ValueError as error:                                           # the airports have no coordinates
+            self.send_error(400, str(error))
+            return
+        if request == 'within':
+            rows, distances = index.within(latitude, longitude, size)
+        else:
+            rows, distances = index.nearest(latitude, longitude, size)
+        answer: dict = {'airports': airport_records(self.server.db, rows.tolist(), distance=distances.round(1).tolist())}
+        self.send_body(json.dumps(answer).encode(), FORMATS['json'])
+
+    def send_body(self, body: bytes, content_type: str) -> None:
+        '''
+        sends a successful response
+
+        param body: the bytes of the response
+        param content_type: the content type of the response
+        return: the response is sent thus returns nothing
+        '''
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def answer_body(db: route_manager.RouteDatabase, query: route_manager.Query, output_format: str, graph_type: str) -> bytes:
+    '''
+    answers one query in the requested format
+
+    param db: the database containing the airlines, airports and routes
+    param query: the query to answer
+    param output_format: string that specifies whether the answer is sent as csv, json or pdf
+    param graph_type: string the specifies what graph type the pdf file should show
+    return: the bytes of the answer
+    '''
+    answer = route_manager.run_query(db, query)
+    if output_format == 'json':
+        return answer.to_json(orient='records').encode()
+
+    text, keys, values = route_manager.answer_csv(answer, query)
+    if output_format == 'csv':
+        return text.encode()
+
+    pdf: io.BytesIO = io.BytesIO()
+    route_manager.render_chart(keys, values, query, graph_type, pdf)
+    return pdf.getvalue()
+
+
+def airport_records(db: route_manager.RouteDatabase, rows: list, **columns: list) -> list:
+    '''
+    param db: the database containing the airlines, airports and routes
+    param rows: rows of the airports table
+    param columns: further columns sent with the airports, one value per row
+    return: a list of one dictionary per row, with the airport's id, AIRPORT_COLUMNS and columns
+    '''
+    airports = db.airports.take(rows)[list(AIRPORT_COLUMNS)].assign(**columns).reset_index()
+    return json.loads(airports.to_json(orient='records'))
+
+
+def parse_arguments(argv: list) -> argparse.Namespace:
+    '''
+    reads the command line arguments, which can be given in any order. the files are read the same way as by
+    route_manager.py and are checked to exist before any of them is loaded
+
+    param argv: the command line arguments, without the program name
+    return: the arguments, named after their flags in lower case
+    '''
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="answers the questions of route_manager.py over http")
+    route_manager.add_table_arguments(parser)
+    parser.add_argument('--HOST', dest='host', default='127.0.0.1', help="the address to listen on")
+    parser.add_argument('--PORT', dest='port', type=route_manager.whole_number, default=8265, help="the port to listen on")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    route_manager.check_table_arguments(parser, args)
+    if args.port > 65535:
+        parser.error("--PORT must be at most 65535")
+    return args
+
+
+def main():
+    args: argparse.Namespace = parse_arguments(sys.argv[1:])                     # exits here on a bad argument, before anything is read
+
+    try:
+        if args.data is not None:                                                 # one combined document instead of the three files
+            db: route_manager.RouteDatabase = route_manager.RouteDatabase.load_combined(args.data)
+        else:
+            db: route_manager.RouteDatabase = route_manager.RouteDatabase.load(args.airlines, args.airports, args.routes)
+    except ValueError as error:                                                   # such as an id on more than one row of a table
+        sys.exit(f"{os.path.basename(sys.argv[0])}: error: {error}")
+    server: RouteServer = RouteServer((args.host, args.port), db)
+    print(f"answering questions on http://{server.server_address[0]}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()